@@ -0,0 +1,52 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:10
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# fill the window of each child with the scores of its last exercises in its current level
+def fill_recent_scores(apps, schema_editor):
+    ChildProfile = apps.get_model('accounts', 'ChildProfile')
+    Exercise = apps.get_model('exercises', 'Exercise')
+    for child in ChildProfile.objects.all():
+        window = settings.LEVEL_PROGRESSION[child.exercise_level]['window']
+        recent_scores = []
+        for exercise in Exercise.objects.filter(child=child, score__isnull=False).order_by('-submission_date')[:window]:
+            # only the exercises since the child moved to its current level
+            if exercise.level != child.exercise_level:
+                break
+            recent_scores.append(exercise.score)
+        # the oldest score first - it is the next one to be replaced
+        recent_scores.reverse()
+        child.recent_scores = [str(score) for score in recent_scores]
+        child.recent_score_sum = sum(recent_scores, Decimal(0))
+        child.save(update_fields=['recent_scores', 'recent_score_sum'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_remove_childprofile_exercise_language'),
+        ('exercises', '0019_submittedletter_child'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='childprofile',
+            name='recent_score_index',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='childprofile',
+            name='recent_score_sum',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=7),
+        ),
+        migrations.AddField(
+            model_name='childprofile',
+            name='recent_scores',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(fill_recent_scores, migrations.RunPython.noop),
+    ]
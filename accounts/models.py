@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
@@ -47,6 +50,52 @@ class ChildProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
     guiding_adult = models.ForeignKey(AdultProfile, on_delete=models.CASCADE, related_name="children")
     exercise_level = models.CharField(max_length=50, choices=ExerciseLevel.choices, default='letters')
+    # the scores of the last exercises in the current level - a ring buffer of settings.LEVEL_PROGRESSION's window
+    # recent_score_index - the place of the oldest score(the next one to be replaced) once the buffer is full
+    recent_scores = models.JSONField(default=list, blank=True)
+    recent_score_index = models.PositiveIntegerField(default=0)
+    recent_score_sum = models.DecimalField(max_digits=7, decimal_places=2, default=0)
+
     def __str__(self):
         return self.user.username
 
+    # adds the score of an exercise in the current level and moves the child to another level if needed
+    # returns True if the level was changed(the caller saves the child)
+    def add_recent_score(self, score):
+        progression = settings.LEVEL_PROGRESSION[self.exercise_level]
+        window = progression['window']
+        # the scores are saved rounded to 2 decimal places - so the sum stays exact
+        score = Decimal(score).quantize(Decimal('0.01'))
+        if len(self.recent_scores) < window:
+            self.recent_scores.append(str(score))
+        else:
+            self.recent_score_sum -= Decimal(self.recent_scores[self.recent_score_index])
+            self.recent_scores[self.recent_score_index] = str(score)
+            self.recent_score_index = (self.recent_score_index + 1) % len(self.recent_scores)
+        self.recent_score_sum += score
+        if len(self.recent_scores) < window:
+            return False
+
+        avg_score = float(self.recent_score_sum) / len(self.recent_scores)
+        if avg_score >= progression['promote']:
+            new_level = ChildProfile.get_next_level(self.exercise_level)
+        elif avg_score <= progression['demote']:
+            new_level = ChildProfile.get_previous_level(self.exercise_level)
+        else:
+            return False
+        if new_level == self.exercise_level:
+            # already in the highest or the lowest level
+            return False
+        self.set_exercise_level(new_level)
+        return True
+
+    # moves the child to another level(by its progression or by the guiding adult)
+    # the window counts only the exercises in the new level - and its size may be different
+    def set_exercise_level(self, level):
+        if level == self.exercise_level:
+            return
+        self.exercise_level = level
+        self.recent_scores = []
+        self.recent_score_index = 0
+        self.recent_score_sum = Decimal(0)
+
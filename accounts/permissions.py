@@ -1,5 +1,7 @@
+from django.shortcuts import get_object_or_404
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import BasePermission
-from .models import User
+from .models import User, ChildProfile
 
 class IsAuthenticatedAdult(BasePermission):
     def has_permission(self, request, view):
@@ -8,4 +10,20 @@ class IsAuthenticatedAdult(BasePermission):
 class IsAuthenticatedChild(BasePermission):
     def has_permission(self, request, view):
         return (request.user.is_authenticated and request.user.role == User.Role.CHILD)
-    
\ No newline at end of file
+    
+
+# for the views of an adult about one of its children - the child's pk is in the url
+# the adult's profile has the same pk as its user - so the ownership is checked without reading it
+class GuidedChildMixin:
+    child_url_kwarg = 'pk'
+
+    # only children of the logged in adult
+    def get_guided_children(self):
+        return ChildProfile.objects.filter(guiding_adult_id=self.request.user.id)
+
+    # a single query - 404 if there is no such child and 403 if it isn't a child of the logged in adult
+    def get_guided_child(self):
+        child = get_object_or_404(ChildProfile, pk=self.kwargs[self.child_url_kwarg])
+        if child.guiding_adult_id != self.request.user.id:
+            raise PermissionDenied("You are not allowed to view this child.")
+        return child
@@ -97,6 +97,12 @@ class ChildSerializer(serializers.ModelSerializer):
     class Meta:
         model = ChildProfile
         fields = ('user', 'exercise_level')
+
+    # the adult moved the child to another level - the recent scores of the old level are dropped
+    def update(self, instance, validated_data):
+        if 'exercise_level' in validated_data:
+            instance.set_exercise_level(validated_data.pop('exercise_level'))
+        return super().update(instance, validated_data)
         
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -77,6 +77,22 @@ class UserTests(BaseTestCase):
         # that child is the one we created in setUp named "child"
         self.assertEqual(response.data[0]["username"], "child")
 
+    def test_children_list_in_one_query(self):
+        ChildProfile.objects.create(user=User.objects.create_user(username="child2", password="test", role=User.Role.CHILD),
+                                    guiding_adult=self.adult_profile)
+        self.client.force_authenticate(user=self.adult_user)
+        # the children with their users - without reading the adult's profile
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("child-list"))
+        self.assertEqual(len(response.data), 2)
+
+    def test_other_adult_child_not_found(self):
+        other_adult = User.objects.create_user(username="adult2", password="test", role=User.Role.ADULT)
+        AdultProfile.objects.create(user=other_adult)
+        self.client.force_authenticate(user=other_adult)
+        response = self.client.get(reverse("child-detail", args=[self.child_user.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     # test permissions - a child cannot its own list of children
     def test_child_cannot_access_children_list(self):
         url = reverse("child-list")
@@ -4,7 +4,7 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .permissions import IsAuthenticatedAdult
+from .permissions import IsAuthenticatedAdult, GuidedChildMixin
 from .serializers import AdultRegisterSerializer, LoginSerializer, LogoutSerializer, ChildRegisterSerializer, ChildSerializer
 
 from .models import *
@@ -41,7 +41,7 @@ class LogoutView(generics.GenericAPIView):
 # model viewset - provides all the CRUD operations: 
 # 6 endpoints: GET(all) / GET(by id) / POST / PUT / PATCH / DELETE
 # POST - registering a child has a different serializer
-class ChildrenView(viewsets.ModelViewSet):
+class ChildrenView(GuidedChildMixin, viewsets.ModelViewSet):
     permission_classes = (IsAuthenticatedAdult,)
     lookup_field = "user_id"
     lookup_url_kwarg = "user_id"
@@ -54,5 +54,5 @@ class ChildrenView(viewsets.ModelViewSet):
     
     # only children of the logged in adult
     def get_queryset(self):
-        adult = AdultProfile.objects.get(user=self.request.user)
-        return ChildProfile.objects.filter(guiding_adult=adult)
\ No newline at end of file
+        # the users are shown with the children
+        return self.get_guided_children().select_related('user')
\ No newline at end of file
@@ -0,0 +1,79 @@
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# the models are loaded on their first use instead of when the app starts
+# so manage.py commands, tests and the server workers start fast
+# the heavy libraries(paddleocr, groq, azure) are imported only when their model is loaded
+# to load them ahead of time - python manage.py warmup_models, or the gunicorn master before forking(gunicorn.conf.py)
+azure_client = None
+groq_client = None
+paddle_ocr = None
+
+# one lock per model - a request that only needs a cloud client won't wait for PaddleOCR to load
+azure_lock = threading.Lock()
+groq_lock = threading.Lock()
+paddle_ocr_lock = threading.Lock()
+
+
+def get_azure_client():
+    global azure_client
+    if azure_client is None:
+        with azure_lock:
+            # another thread could have loaded it while this one waited for the lock
+            if azure_client is None:
+                try:
+                    from azure.ai.inference import ChatCompletionsClient
+                    from azure.core.credentials import AzureKeyCredential
+                    azure_client = ChatCompletionsClient(
+                        endpoint='https://models.github.ai/inference',
+                        credential=AzureKeyCredential(settings.AZURE_TOKEN)
+                    )
+                except Exception:
+                    logger.exception("Failed to initialize the Azure client")
+    return azure_client
+
+
+def get_groq_client():
+    global groq_client
+    if groq_client is None:
+        with groq_lock:
+            if groq_client is None:
+                try:
+                    from groq import Groq
+                    groq_client = Groq(api_key=settings.GROQ_API_KEY)
+                except Exception:
+                    logger.exception("Failed to initialize the Groq client")
+    return groq_client
+
+
+def create_paddle_ocr():
+    from paddleocr import PaddleOCR
+    return PaddleOCR(use_angle_cls=True, lang='en', show_log=False)
+
+
+# when there is an OCR server the model is loaded only there(python manage.py run_ocr_server)
+def get_paddle_ocr():
+    global paddle_ocr
+    if paddle_ocr is None and not settings.OCR_SERVER_SOCKET:
+        with paddle_ocr_lock:
+            if paddle_ocr is None:
+                try:
+                    paddle_ocr = create_paddle_ocr()
+                except Exception:
+                    logger.exception("Failed to initialize the PaddleOCR client")
+    return paddle_ocr
+
+
+# returns the names of the models that were loaded
+def warm_up_models():
+    models = {
+        'azure': get_azure_client(),
+        'groq': get_groq_client(),
+        'paddleocr': get_paddle_ocr(),
+    }
+    return [name for name, model in models.items() if model is not None]
@@ -0,0 +1,50 @@
+import hashlib
+import threading
+
+from django.core.cache import caches
+
+
+# the models' analysis of the submitted images - the same photo won't be sent to the models again
+# the backend(memory/file/database), its size and the entries' lifetime are set in the 'analysis' cache in settings.CACHES
+hits = 0
+misses = 0
+counters_lock = threading.Lock()
+
+
+# the fields of the models' analysis(models.ModelsAnalysis) that are kept in the cache
+CACHED_FIELDS = ('vlm_provider', 'vlm_answer_parts', 'ocr_text', 'ocr_scores')
+# change it whenever the cached entries change - the entries of the old format are in other keys and won't be read
+CACHE_FORMAT = 2
+
+
+# the key is made of the image's content, so the same photo is found even if it was uploaded again
+# analysis_version - changes when the prompts or the image preprocessing change
+def analysis_cache_key(image_bytes, level, category, analysis_version):
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    return f"analysis:f{CACHE_FORMAT}:v{analysis_version}:{level}:{category}:{image_hash}"
+
+
+# returns the cached fields of the analysis or None if the image wasn't analyzed before
+def get_cached_analysis(key):
+    global hits, misses
+    analysis = caches['analysis'].get(key)
+    with counters_lock:
+        if analysis is None:
+            misses += 1
+        else:
+            hits += 1
+    return analysis
+
+
+def set_cached_analysis(key, analysis):
+    caches['analysis'].set(key, {field: getattr(analysis, field) for field in CACHED_FIELDS})
+
+
+def analysis_cache_stats():
+    with counters_lock:
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else None,
+        }
@@ -0,0 +1,47 @@
+import numpy as np
+
+from .views import VLM_WEIGHT, PADDLEOCR_WEIGHT, CONFUSED_LETTER_CREDIT, LETTERS_CONFUSION_MAP
+
+# "expected letter + submitted letter" of every pair of visually confusing letters
+CONFUSED_PAIRS = np.array([expected + submitted for expected, confused in LETTERS_CONFUSION_MAP.items() for submitted in confused])
+
+
+# the scoring rules of score_recognized_text(views.py) on the letters of many exercises at once
+# the letters are already aligned with the requested text - each letter has what each model recognized in its position
+# the arguments are arrays with an item per letter:
+#   exercise_indexes - the index of the letter's exercise(0 to exercise_count - 1)
+#   expected, vlm_letters, ocr_letters - the letters('' - nothing was recognized)
+#   vlm_scores, ocr_scores - the models' confidence
+# text_similarities - an item per exercise
+# returns (the submitted letters, the letters' scores, the exercises' scores)
+def score_letters(exercise_indexes, expected, vlm_letters, vlm_scores, ocr_letters, ocr_scores, text_similarities):
+    exercise_count = len(text_similarities)
+    recognized = vlm_letters != ''
+    # the rules are checked by their order - a letter takes the first rule it matches
+    both_agree = recognized & (vlm_letters == ocr_letters)
+    vlm_correct = ~both_agree & (vlm_letters == expected)
+    ocr_correct = ~both_agree & ~vlm_correct & (ocr_letters == expected)
+    only_vlm = ~both_agree & ~vlm_correct & ~ocr_correct & recognized
+    only_ocr = ~both_agree & ~vlm_correct & ~ocr_correct & ~recognized & (ocr_letters != '')
+
+    # the VLM's letter when PaddleOCR didn't agree - PaddleOCR's confidence lowers the score
+    vlm_alone_score = np.where(ocr_scores != 0, 1 - ocr_scores * PADDLEOCR_WEIGHT, VLM_WEIGHT)
+    uses_vlm = both_agree | vlm_correct | only_vlm
+    uses_ocr = ocr_correct | only_ocr
+    submitted = np.where(uses_vlm, vlm_letters, np.where(uses_ocr, ocr_letters, ''))
+    letter_scores = np.select(
+        [both_agree, vlm_correct | only_vlm, uses_ocr],
+        [vlm_scores * VLM_WEIGHT + ocr_scores * PADDLEOCR_WEIGHT, vlm_alone_score, ocr_scores * PADDLEOCR_WEIGHT],
+        default=0.0
+    )
+
+    # a correct letter counts in full and a visually confusing one counts partly
+    credit = np.where(submitted == expected, letter_scores, 0.0)
+    confused = (submitted != expected) & np.isin(np.char.add(expected, submitted), CONFUSED_PAIRS)
+    credit = np.where(confused, CONFUSED_LETTER_CREDIT * letter_scores, credit)
+
+    letter_counts = np.bincount(exercise_indexes, minlength=exercise_count)
+    credit_sums = np.bincount(exercise_indexes, weights=credit, minlength=exercise_count)
+    avg_correctly_guessed_scores = credit_sums / np.maximum(letter_counts, 1)
+    exercise_scores = (avg_correctly_guessed_scores + text_similarities) / 2
+    return submitted, letter_scores, exercise_scores
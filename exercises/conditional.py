@@ -0,0 +1,51 @@
+from django.db.models import Count, Max
+
+from .models import Exercise, Article
+
+
+# the validators of the conditional GET requests(ETag and Last-Modified)
+# the parents' dashboards poll the endpoints again and again - when nothing changed they get 304
+# before the statistics are aggregated or the response is serialized
+# each validator is a single aggregate query - it is saved on the request since the etag and the last modified use it
+
+
+# the child's submissions change only when the child submits an exercise, when the submission worker scores it
+# or when rescore_exercises scores it again(the scored date of the exercise changes)
+# empty for a child that isn't of the current adult - then the view runs and returns 403
+def get_child_submissions_version(request, pk):
+    if not hasattr(request, 'child_submissions_version'):
+        request.child_submissions_version = (
+            Exercise.objects.filter(child_id=pk, child__guiding_adult_id=request.user.id).exclude(submission_date=None)
+            .aggregate(last_submission=Max('submission_date'), last_scoring=Max('scored_date'),
+                       count=Count('id'), scored_count=Count('score'))
+        )
+    return request.child_submissions_version
+
+def child_submissions_etag(request, pk, *args, **kwargs):
+    version = get_child_submissions_version(request, pk)
+    if version['count'] == 0:
+        return None
+    last_scoring = version['last_scoring'].timestamp() if version['last_scoring'] else None
+    return f"child-{pk}-{version['count']}-{version['scored_count']}-{version['last_submission'].timestamp()}-{last_scoring}"
+
+# the scoring of an asynchronous submission happens after its submission date
+# so there is no Last-Modified while one of the submissions is waiting to be scored(the ETag still changes)
+def child_submissions_last_modified(request, pk, *args, **kwargs):
+    version = get_child_submissions_version(request, pk)
+    if version['count'] == 0 or version['scored_count'] != version['count']:
+        return None
+    return max(version['last_submission'], version['last_scoring'] or version['last_submission'])
+
+
+def get_articles_version(request):
+    if not hasattr(request, 'articles_version'):
+        request.articles_version = Article.objects.aggregate(last_update=Max('updated_date'), count=Count('id'))
+    return request.articles_version
+
+# adding or deleting an article changes the count and editing one changes the last update
+# there is no Last-Modified - deleting the newest article would move it back and If-Modified-Since would get 304
+def articles_etag(request, *args, **kwargs):
+    version = get_articles_version(request)
+    if version['count'] == 0:
+        return None
+    return f"articles-{version['count']}-{version['last_update'].timestamp()}"
@@ -0,0 +1,60 @@
+import base64
+import io
+
+import numpy as np
+from PIL import Image, ImageOps
+from django.conf import settings
+
+
+# pixels darker than this part of the paper's(median) brightness are counted as ink
+INK_DARKNESS_RATIO = 0.6
+# the margin around the ink that is kept when cropping(a part of the image's size)
+INK_CROP_MARGIN = 0.05
+# the quality of the jpeg that is sent to the VLM
+VLM_JPEG_QUALITY = 85
+
+
+# the phone photos are much bigger than what the models need to read a word
+# returns a grayscale uint8 array - PaddleOCR accepts it as is
+def preprocess_image(image_bytes, max_side=None, crop_to_ink=None):
+    max_side = max_side or settings.IMAGE_MAX_SIDE
+    crop_to_ink = settings.IMAGE_CROP_TO_INK if crop_to_ink is None else crop_to_ink
+    img = Image.open(io.BytesIO(image_bytes))
+    # for jpeg - decode the image already scaled down(much faster than decoding it in full size)
+    img.draft('L', (max_side, max_side))
+    # phones save the photo as it was taken and only write its rotation in the EXIF data
+    img = ImageOps.exif_transpose(img)
+    img = img.convert('L')
+    img.thumbnail((max_side, max_side))
+    # asarray copies the pixels only once(np.array would copy them again)
+    img_np = np.asarray(img, dtype=np.uint8)
+    if crop_to_ink:
+        img_np = crop_to_ink_box(img_np)
+    return img_np
+
+
+# crop the image to the bounding box of the writing(keeps a small margin around it)
+def crop_to_ink_box(img_np):
+    ink = img_np < np.median(img_np) * INK_DARKNESS_RATIO
+    rows = np.flatnonzero(ink.any(axis=1))
+    columns = np.flatnonzero(ink.any(axis=0))
+    # nothing that looks like writing - keep the whole image
+    if rows.size == 0:
+        return img_np
+    margin = int(max(img_np.shape) * INK_CROP_MARGIN)
+    top, bottom = max(rows[0] - margin, 0), min(rows[-1] + margin + 1, img_np.shape[0])
+    left, right = max(columns[0] - margin, 0), min(columns[-1] + margin + 1, img_np.shape[1])
+    # a view of the original array - not a copy
+    return img_np[top:bottom, left:right]
+
+
+# the cached analysis depends on how the image was preprocessed
+def preprocessing_signature():
+    return f"{settings.IMAGE_MAX_SIDE}{'-ink' if settings.IMAGE_CROP_TO_INK else ''}"
+
+
+# the image inside the VLM request - the VLM doesn't need to download it
+def image_to_data_url(img_np):
+    buffer = io.BytesIO()
+    Image.fromarray(img_np).save(buffer, format='JPEG', quality=VLM_JPEG_QUALITY)
+    return "data:image/jpeg;base64," + base64.b64encode(buffer.getvalue()).decode('ascii')
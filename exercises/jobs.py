@@ -0,0 +1,71 @@
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SubmissionJob
+from .views import evaluate_submission
+from .timing import collect_spans, log_spans
+from .tracing import sample_trace
+
+logger = logging.getLogger(__name__)
+
+# how many times a job is tried before it is marked as failed
+MAX_JOB_ATTEMPTS = 3
+
+
+# take the oldest pending job and mark it as running
+# skip_locked - several workers can poll the table without taking the same job
+def claim_next_job():
+    with transaction.atomic():
+        job = (SubmissionJob.objects.select_for_update(skip_locked=True)
+               .filter(status=SubmissionJob.Status.PENDING)
+               .order_by('created_date')
+               .first())
+        if job is None:
+            return None
+        job.status = SubmissionJob.Status.RUNNING
+        job.attempts += 1
+        job.started_date = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'started_date'])
+    return job
+
+
+def run_job(job):
+    exercise = job.exercise
+    try:
+        # the exercise is scored in a single transaction(evaluate_submission) - a failed attempt left nothing behind
+        # a scored exercise means the previous attempt committed and its worker died before marking the job as done
+        # scoring it again would count it twice in the child's statistics and level window
+        if exercise.score is not None:
+            logger.info("Submission job %s was already scored (attempt %s)", job.id, job.attempts)
+        else:
+            with collect_spans() as spans, sample_trace():
+                evaluate_submission(exercise, exercise.submission_date)
+            log_spans('submission_job', spans, exercise=exercise.pk, job=job.id)
+    except Exception as e:
+        logger.exception("Submission job %s failed (attempt %s)", job.id, job.attempts)
+        job.error = str(e)
+        # put it back in the queue if it still has attempts left
+        job.status = SubmissionJob.Status.PENDING if job.attempts < MAX_JOB_ATTEMPTS else SubmissionJob.Status.FAILED
+    else:
+        job.error = None
+        job.status = SubmissionJob.Status.DONE
+    job.finished_date = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_date'])
+    return job
+
+
+# jobs that are running for too long belong to a worker that was killed in the middle
+# a job that used all of its attempts is marked as failed - it may be the one that kills the workers(an image that runs out of memory)
+# returns how many jobs were queued again
+def requeue_stale_jobs(stale_after_seconds):
+    stale_date = timezone.now() - timedelta(seconds=stale_after_seconds)
+    stale_jobs = SubmissionJob.objects.filter(status=SubmissionJob.Status.RUNNING, started_date__lt=stale_date)
+    failed = stale_jobs.filter(attempts__gte=MAX_JOB_ATTEMPTS).update(
+        status=SubmissionJob.Status.FAILED, error="The worker stopped while running the job", finished_date=timezone.now()
+    )
+    if failed:
+        logger.warning("%s abandoned submission jobs used all of their attempts and failed", failed)
+    return stale_jobs.update(status=SubmissionJob.Status.PENDING)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from exercises.stats import rebuild_child_stats
+
+
+# builds the children's statistics tables from their scored exercises
+# run it after the tables were added, or to fix them after exercises were changed by hand
+class Command(BaseCommand):
+    help = "Builds the children's statistics from their scored exercises"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--child', type=int, action='append', dest='child_ids',
+                            help="The id of a child to rebuild(can be repeated) - all the children by default")
+
+    def handle(self, *args, **options):
+        rebuild_child_stats(options['child_ids'])
+        self.stdout.write("The children's statistics were built")
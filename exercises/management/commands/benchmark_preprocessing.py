@@ -0,0 +1,58 @@
+import io
+import statistics
+import time
+from pathlib import Path
+
+import Levenshtein
+import numpy as np
+from PIL import Image
+from django.core.management.base import BaseCommand, CommandError
+
+from exercises.ai_models import get_paddle_ocr
+from exercises.image_processing import preprocess_image
+from exercises.views import get_paddleocr_text_and_scores
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+# compares PaddleOCR on the original photos with PaddleOCR on the preprocessed ones
+# the expected text of each image is its file name up to the first "_"(cat_1.jpg - cat)
+class Command(BaseCommand):
+    help = "Benchmarks the latency and accuracy of PaddleOCR with and without the image preprocessing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('images_folder')
+        parser.add_argument('--max-side', type=int, default=None)
+        parser.add_argument('--crop-to-ink', action='store_true')
+
+    def handle(self, *args, **options):
+        images = sorted(path for path in Path(options['images_folder']).iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+        if not images:
+            raise CommandError("No images in the folder")
+        paddle_ocr = get_paddle_ocr()
+        if paddle_ocr is None:
+            raise CommandError("PaddleOCR couldn't be loaded")
+
+        def original(image_bytes):
+            return np.array(Image.open(io.BytesIO(image_bytes)))
+
+        def preprocessed(image_bytes):
+            return preprocess_image(image_bytes, options['max_side'], options['crop_to_ink'])
+
+        for name, prepare in (('original', original), ('preprocessed', preprocessed)):
+            latencies = []
+            accuracies = []
+            for path in images:
+                expected_text = path.stem.split('_')[0]
+                image_bytes = path.read_bytes()
+                start = time.perf_counter()
+                results = paddle_ocr.ocr(prepare(image_bytes), cls=True)
+                latencies.append(time.perf_counter() - start)
+                text, _ = get_paddleocr_text_and_scores(results)
+                accuracies.append(Levenshtein.ratio(expected_text, text))
+            self.stdout.write(
+                f"{name}: {len(images)} images, "
+                f"p50 {statistics.median(latencies) * 1000:.0f}ms, "
+                f"max {max(latencies) * 1000:.0f}ms, "
+                f"accuracy(levenshtein ratio) {statistics.mean(accuracies):.3f}"
+            )
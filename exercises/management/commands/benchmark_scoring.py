@@ -0,0 +1,224 @@
+import contextlib
+import json
+import logging
+import platform
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from exercises import views
+from exercises.image_processing import preprocess_image
+from exercises.models import Exercise, ModelsAnalysis
+from exercises.tracing import trace_logger
+
+STAGES = ('preprocess_image', 'get_models_analysis', 'compare_expected_with_recognized', 'score_exercise', 'total')
+
+
+# replays a corpus of submitted images with the answers the models gave for them through the scoring path
+# the cloud clients and PaddleOCR are replaced by fakes that return the recorded answers - so it runs offline
+# the corpus folder has the images and corpus.json - a list of:
+# {"image": "cat_1.jpg", "requested_text": "cat", "level": "words", "category": "animal",
+#  "VLM_answer": "1. Yes 2. cat 3. Nice and clear letters", "paddleocr_results": [...]}
+# --record fills the answers of the entries that don't have them yet by asking the real models
+# --stored N replays only the scoring of the last N submissions from the models' analyses saved with them(no images needed)
+class Command(BaseCommand):
+    help = "Benchmarks the scoring of a recorded corpus of submissions(offline) and saves the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('corpus_folder', nargs='?')
+        parser.add_argument('--iterations', type=int, default=5, help="How many times the corpus is replayed")
+        parser.add_argument('--output', help="The JSON file to save the results in")
+        parser.add_argument('--baseline', help="The JSON results of a previous run to compare with")
+        parser.add_argument('--record', action='store_true', help="Ask the real models for the missing answers")
+        parser.add_argument('--stored', type=int, help="Replay the scoring of the last N saved submissions instead of a corpus")
+
+    def handle(self, *args, **options):
+        if options['stored']:
+            results = self.benchmark_stored(options['stored'], options['iterations'])
+            results['corpus'] = f"the last {options['stored']} saved submissions"
+            self.report(results, options)
+            return
+        if not options['corpus_folder']:
+            raise CommandError("Give a corpus folder or --stored")
+        folder = Path(options['corpus_folder'])
+        corpus_file = folder / 'corpus.json'
+        if not corpus_file.exists():
+            raise CommandError(f"There is no corpus.json in {folder}")
+        corpus = json.loads(corpus_file.read_text())
+        for entry in corpus:
+            entry['image_bytes'] = (folder / entry['image']).read_bytes()
+
+        if options['record']:
+            self.record(corpus)
+            corpus_file.write_text(json.dumps(
+                [{key: value for key, value in entry.items() if key != 'image_bytes'} for entry in corpus], indent=2
+            ))
+        missing = [entry['image'] for entry in corpus if 'VLM_answer' not in entry or 'paddleocr_results' not in entry]
+        if missing:
+            raise CommandError(f"The answers of {', '.join(missing)} weren't recorded(run with --record)")
+
+        results = self.benchmark(corpus, options['iterations'])
+        results['corpus'] = str(folder)
+        self.report(results, options)
+
+    def report(self, results, options):
+        for stage, latencies in results['stages'].items():
+            self.stdout.write(f"{stage}: p50 {latencies['p50_ms']:.2f}ms, p95 {latencies['p95_ms']:.2f}ms, "
+                              f"p99 {latencies['p99_ms']:.2f}ms, max {latencies['max_ms']:.2f}ms")
+        self.stdout.write(f"throughput: {results['submissions_per_second']:.1f} submissions/s, "
+                          f"memory peak: {results['memory_peak_bytes'] / 1024 / 1024:.1f}MB")
+        if options['baseline']:
+            self.compare(results, json.loads(Path(options['baseline']).read_text()))
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+
+    # the real models - the answers are saved in the corpus
+    def record(self, corpus):
+        for entry in corpus:
+            if 'VLM_answer' in entry and 'paddleocr_results' in entry:
+                continue
+            exercise = Exercise(requested_text=entry['requested_text'], level=entry['level'], category=entry.get('category'))
+            img_np = preprocess_image(entry['image_bytes'])
+            VLM_answer, _ = views.get_VLM_answer(views.get_VLM_prompt(exercise), views.image_to_data_url(img_np))
+            # only the text of the answer is kept(None if no provider answered)
+            entry['VLM_answer'] = VLM_answer.choices[0].message.content if VLM_answer else None
+            # json keeps the tuples of the results as lists - they are read the same way
+            paddleocr_results, _ = views.get_paddleocr_results(img_np)
+            entry['paddleocr_results'] = json.loads(json.dumps(paddleocr_results, default=float))
+            self.stdout.write(f"recorded {entry['image']}")
+
+    def benchmark(self, corpus, iterations):
+        replayed = {}
+        # the fakes answer for the entry that is replayed now
+        fake_paddle_ocr = mock.Mock()
+        fakes = [
+            mock.patch.object(views, 'get_VLM_answer', lambda prompt, image_url: (fake_VLM_answer(replayed['entry']['VLM_answer']), 'corpus')),
+            mock.patch.object(views, 'get_paddleocr_results', lambda img_np: (replayed['entry']['paddleocr_results'], False)),
+            mock.patch.object(views, 'get_paddle_ocr', lambda: fake_paddle_ocr),
+            # every replay runs the whole analysis
+            mock.patch.object(views, 'get_cached_analysis', lambda key: None),
+            mock.patch.object(views, 'set_cached_analysis', lambda key, analysis: None),
+        ]
+
+        def replay(entry, latencies):
+            replayed['entry'] = entry
+            exercise = Exercise(requested_text=entry['requested_text'], level=entry['level'], category=entry.get('category'))
+            exercise.submitted_text = ""
+            start = time.perf_counter()
+            preprocess_image(entry['image_bytes'])
+            latencies['preprocess_image'].append(time.perf_counter() - start)
+
+            analysis_start = time.perf_counter()
+            analysis = views.get_models_analysis(exercise, entry['image_bytes'])
+            latencies['get_models_analysis'].append(time.perf_counter() - analysis_start)
+
+            compare_start = time.perf_counter()
+            views.compare_expected_with_recognized(exercise.requested_text, analysis.ocr_text or '', analysis.get_ocr_scores())
+            latencies['compare_expected_with_recognized'].append(time.perf_counter() - compare_start)
+
+            scoring_start = time.perf_counter()
+            if analysis.ocr_text is not None or analysis.VLM_guess is not None:
+                views.score_exercise(exercise, analysis)
+            latencies['score_exercise'].append(time.perf_counter() - scoring_start)
+            # preprocess_image is measured on its own - it is also a part of get_models_analysis
+            latencies['total'].append(time.perf_counter() - analysis_start)
+
+        latencies = {stage: [] for stage in STAGES}
+        with contextlib.ExitStack() as stack, override_settings(OCR_SERVER_SOCKET=None):
+            for fake in fakes:
+                stack.enter_context(fake)
+            stack.enter_context(quiet_trace())
+            # a warm up round that isn't measured(imports, the executor's thread)
+            for entry in corpus:
+                replay(entry, {stage: [] for stage in STAGES})
+            for _ in range(iterations):
+                for entry in corpus:
+                    replay(entry, latencies)
+            # the memory is measured on its own round - tracemalloc slows everything down
+            tracemalloc.start()
+            for entry in corpus:
+                replay(entry, {stage: [] for stage in STAGES})
+            memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        return {
+            'python': platform.python_version(),
+            'submissions': len(latencies['total']),
+            'stages': {stage: summarize_latencies(stage_latencies) for stage, stage_latencies in latencies.items()},
+            'submissions_per_second': len(latencies['total']) / sum(latencies['total']),
+            'memory_peak_bytes': memory_peak,
+        }
+
+    # the scoring of the saved submissions from their models' analyses - the models and the images aren't needed
+    def benchmark_stored(self, count, iterations):
+        analyses = list(
+            ModelsAnalysis.objects.select_related('exercise').order_by('-exercise__submission_date')
+            .only('vlm_answer_parts', 'ocr_text', 'ocr_scores', 'exercise__requested_text')[:count]
+        )
+        if not analyses:
+            raise CommandError("There are no saved analyses of submissions")
+        submissions = [(analysis.exercise.requested_text, analysis.VLM_guess, analysis.ocr_text, analysis.get_ocr_scores())
+                       for analysis in analyses]
+        latencies = []
+        with quiet_trace():
+            # the first round warms up
+            for iteration in range(iterations + 1):
+                for submission in submissions:
+                    start = time.perf_counter()
+                    views.score_recognized_text(*submission)
+                    if iteration:
+                        latencies.append(time.perf_counter() - start)
+            tracemalloc.start()
+            for submission in submissions:
+                views.score_recognized_text(*submission)
+            memory_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return {
+            'python': platform.python_version(),
+            'submissions': len(latencies),
+            'stages': {'score_recognized_text': summarize_latencies(latencies)},
+            'submissions_per_second': len(latencies) / sum(latencies),
+            'memory_peak_bytes': memory_peak,
+        }
+
+    def compare(self, results, baseline):
+        for stage, latencies in results['stages'].items():
+            if stage not in baseline['stages']:
+                continue
+            baseline_p50 = baseline['stages'][stage]['p50_ms']
+            change = (latencies['p50_ms'] - baseline_p50) / baseline_p50 * 100 if baseline_p50 else 0.0
+            self.stdout.write(f"{stage}: p50 {baseline_p50:.2f}ms -> {latencies['p50_ms']:.2f}ms ({change:+.1f}%)")
+
+
+# the scoring's trace isn't logged during the benchmark(even if it is turned on) - it would be measured too
+@contextlib.contextmanager
+def quiet_trace():
+    level = trace_logger.level
+    trace_logger.setLevel(logging.WARNING)
+    try:
+        yield
+    finally:
+        trace_logger.setLevel(level)
+
+# the answer of the providers' clients with the recorded text
+def fake_VLM_answer(content):
+    if content is None:
+        return None
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def summarize_latencies(latencies):
+    latencies_ms = np.array(latencies) * 1000
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+    return {
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+        'mean_ms': float(latencies_ms.mean()),
+        'max_ms': float(latencies_ms.max()),
+    }
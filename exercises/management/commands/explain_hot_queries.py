@@ -0,0 +1,103 @@
+import string
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from accounts.models import AdultProfile, ChildProfile, User
+from exercises.models import Exercise, SubmittedLetter, SubmissionJob, ChildLetterStats
+
+LEVELS = ChildProfile.ExerciseLevel.values
+
+
+# the queries that run with every exercise generation, submission and parent's dashboard
+# and the index each of them should use
+def get_hot_queries(child):
+    exercise = Exercise.objects.filter(child=child).first()
+    return [
+        ("unsubmitted exercise of the child", 'exercise_unsubmitted_child_idx',
+         Exercise.objects.filter(child=child, submission_date=None).order_by('pk')[:1]),
+        ("exercises of the child in a level", 'exercise_child_level_idx',
+         Exercise.objects.filter(child=child, level=child.exercise_level)),
+        ("page of the submissions of the child", 'exercise_child_submission_idx',
+         Exercise.objects.filter(child=child).exclude(submission_date=None).order_by('-submission_date', '-pk')[:21]),
+        ("letters of an exercise", 'letter_exercise_position_idx',
+         SubmittedLetter.objects.filter(exercise=exercise).order_by('position')),
+        ("letters of the child by the expected letter", 'letter_child_expected_idx',
+         SubmittedLetter.objects.filter(child=child).values('expected_letter').annotate(total=Count('id')).order_by('expected_letter')),
+        ("letter statistics of the child", 'unique_child_letter_stats',
+         ChildLetterStats.objects.filter(child=child).order_by('letter')),
+        ("oldest pending submission job", 'job_pending_created_idx',
+         SubmissionJob.objects.filter(status=SubmissionJob.Status.PENDING).order_by('created_date')[:1]),
+    ]
+
+
+# many children with their submitted exercises, letters, statistics and jobs - so the planner's choices are the ones of a real database
+# returns one of the seeded children
+def seed_dataset(children_count, exercises_per_child):
+    adult_user = User.objects.create(username='explain_hot_queries_adult', password='!', role=User.Role.ADULT)
+    adult = AdultProfile.objects.create(user=adult_user)
+    users = User.objects.bulk_create([
+        User(username=f'explain_hot_queries_child{i}', password='!', role=User.Role.CHILD) for i in range(children_count)
+    ])
+    children = ChildProfile.objects.bulk_create([
+        ChildProfile(user=user, guiding_adult=adult, exercise_level=LEVELS[i % len(LEVELS)]) for i, user in enumerate(users)
+    ])
+    now = timezone.now()
+    # the children submit at the same time - their exercises are mixed in the table(as they are in a real one)
+    exercises = Exercise.objects.bulk_create([
+        # the last exercise of each child wasn't submitted yet
+        Exercise(child=child, requested_text="abcd", submitted_text="abcd", level=LEVELS[j % len(LEVELS)], score=0.5,
+                 submission_date=now - timedelta(minutes=j) if j else None)
+        for j in reversed(range(exercises_per_child)) for child in children
+    ], batch_size=5000)
+    submitted = [exercise for exercise in exercises if exercise.submission_date is not None]
+    SubmittedLetter.objects.bulk_create([
+        SubmittedLetter(exercise=exercise, child_id=exercise.child_id, expected_letter=letter,
+                        submitted_letter=letter, score=0.5, position=position)
+        for exercise in submitted for position, letter in enumerate(exercise.requested_text)
+    ], batch_size=5000)
+    ChildLetterStats.objects.bulk_create([
+        ChildLetterStats(child=child, letter=letter) for child in children for letter in string.ascii_lowercase
+    ], batch_size=5000)
+    # almost all the jobs are done - only a few are pending
+    SubmissionJob.objects.bulk_create([
+        SubmissionJob(exercise=exercise, status=SubmissionJob.Status.PENDING if i % 1000 == 0 else SubmissionJob.Status.DONE)
+        for i, exercise in enumerate(submitted)
+    ], batch_size=5000)
+    with connection.cursor() as cursor:
+        for model in (User, ChildProfile, Exercise, SubmittedLetter, ChildLetterStats, SubmissionJob):
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+    return children[len(children) // 2]
+
+
+# returns the name, the index it should use and the plan of each of the hot queries
+# the dataset is seeded in a transaction that is rolled back - the database isn't changed
+def explain_hot_queries(children_count, exercises_per_child):
+    with transaction.atomic():
+        child = seed_dataset(children_count, exercises_per_child)
+        plans = [(name, index, queryset.explain()) for name, index, queryset in get_hot_queries(child)]
+        transaction.set_rollback(True)
+    return plans
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the hot queries over a seeded dataset and fails if any of them doesn't use its index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--children', type=int, default=200, help="How many children are seeded")
+        parser.add_argument('--exercises', type=int, default=50, help="How many exercises each seeded child has")
+
+    def handle(self, *args, **options):
+        missing_indexes = 0
+        for name, index, plan in explain_hot_queries(options['children'], options['exercises']):
+            if index not in plan:
+                missing_indexes += 1
+                self.stderr.write(f"{name} doesn't use {index}:\n{plan}\n")
+            elif options['verbosity'] > 1:
+                self.stdout.write(f"{name}:\n{plan}\n")
+        if missing_indexes:
+            raise CommandError(f"{missing_indexes} hot queries don't use their indexes")
+        self.stdout.write("All the hot queries use their indexes")
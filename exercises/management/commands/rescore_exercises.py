@@ -0,0 +1,120 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from exercises.batch_scoring import score_letters
+from exercises.models import Exercise, SubmittedLetter
+from exercises.stats import rebuild_child_stats, saved_score
+
+# the scores are saved with 2 decimal places - a smaller difference doesn't change the saved score
+SAVED_SCORE_PRECISION = 0.005
+
+
+# scores the submitted exercises again with the current scoring rules(after their weights were changed)
+# from what the models recognized in each letter - without calling the models again
+# the exercises that were scored before the models' letters were kept are skipped
+class Command(BaseCommand):
+    help = "Scores the submitted exercises again from the models' saved letters and saves the changed scores"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the changes, without saving them")
+        parser.add_argument('--batch-size', type=int, default=10000, help="How many exercises are scored together")
+        parser.add_argument('--child', type=int, action='append', dest='child_ids',
+                            help="The id of a child to score(can be repeated) - all the children by default")
+        parser.add_argument('--show', type=int, default=10, help="How many of the biggest changes to list")
+
+    def handle(self, *args, **options):
+        exercises = Exercise.objects.filter(text_similarity__isnull=False).order_by('pk')
+        if options['child_ids']:
+            exercises = exercises.filter(child_id__in=options['child_ids'])
+        totals = {'exercises': 0, 'letters': 0, 'changed_exercises': 0, 'changed_letters': 0}
+        exercise_changes = []
+        start = time.perf_counter()
+        last_pk = 0
+        while True:
+            # keyset pagination - every batch is read from the primary key index
+            batch = list(exercises.filter(pk__gt=last_pk).values_list('pk', 'score', 'text_similarity')[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            changes = self.rescore_batch(batch, options['dry_run'])
+            for key in totals:
+                totals[key] += changes[key]
+            exercise_changes.extend(changes['exercise_changes'])
+            # only the biggest changes are kept for the report
+            exercise_changes = sorted(exercise_changes, key=lambda change: -abs(change[2] - change[1]))[:options['show']]
+
+        duration = time.perf_counter() - start
+        self.stdout.write(
+            f"{totals['exercises']} exercises({totals['letters']} letters) scored in {duration:.1f}s - "
+            f"{totals['changed_exercises']} exercises and {totals['changed_letters']} letters changed"
+        )
+        for pk, old_score, new_score in exercise_changes:
+            self.stdout.write(f"exercise {pk}: {old_score:.2f} -> {new_score:.2f}")
+        if options['dry_run']:
+            self.stdout.write("Dry run - nothing was saved")
+        elif totals['changed_exercises'] or totals['changed_letters']:
+            # the statistics are sums of the scores
+            rebuild_child_stats(options['child_ids'])
+            self.stdout.write("The changed scores were saved and the children's statistics were built again")
+
+    def rescore_batch(self, batch, dry_run):
+        exercise_pks = np.array([pk for pk, _, _ in batch])
+        old_exercise_scores = np.array([float(score) if score is not None else np.nan for _, score, _ in batch])
+        text_similarities = np.array([similarity for _, _, similarity in batch])
+        letters = list(
+            SubmittedLetter.objects.filter(exercise_id__in=exercise_pks.tolist()).order_by('exercise_id', 'position')
+            .values_list('pk', 'exercise_id', 'expected_letter', 'submitted_letter', 'score',
+                         'vlm_letter', 'vlm_score', 'ocr_letter', 'ocr_score')
+        )
+        if letters:
+            letter_pks, letter_exercise_pks, expected, old_submitted, old_letter_scores, vlm_letters, vlm_scores, ocr_letters, ocr_scores = (
+                np.array(column) for column in zip(*letters)
+            )
+            old_letter_scores = old_letter_scores.astype(float)
+            vlm_scores = np.array(vlm_scores, dtype=float)
+            ocr_scores = np.array(ocr_scores, dtype=float)
+            # the batch is sorted by the pk - the index of each letter's exercise in it
+            exercise_indexes = np.searchsorted(exercise_pks, letter_exercise_pks)
+        else:
+            letter_pks = exercise_indexes = np.array([], dtype=int)
+            expected = old_submitted = vlm_letters = ocr_letters = np.array([], dtype='<U1')
+            old_letter_scores = vlm_scores = ocr_scores = np.array([], dtype=float)
+
+        submitted, letter_scores, exercise_scores = score_letters(
+            exercise_indexes, expected, vlm_letters, vlm_scores, ocr_letters, ocr_scores, text_similarities
+        )
+        changed_letters = ((np.abs(np.round(letter_scores, 2) - old_letter_scores) >= SAVED_SCORE_PRECISION)
+                           | (submitted != old_submitted))
+        changed_exercises = ~(np.abs(np.round(exercise_scores, 2) - old_exercise_scores) < SAVED_SCORE_PRECISION)
+
+        if not dry_run:
+            # the exercises whose score or letters changed get a new scored date - the parents' cached responses are revalidated
+            rescored_exercises = changed_exercises.copy()
+            rescored_exercises[exercise_indexes[changed_letters]] = True
+            # an exercise with only changed letters keeps its saved score
+            saved_exercise_scores = np.where(changed_exercises, exercise_scores, old_exercise_scores)
+            scored_date = timezone.now()
+            with transaction.atomic():
+                SubmittedLetter.objects.bulk_update(
+                    [SubmittedLetter(pk=int(pk), submitted_letter=letter, score=saved_score(SubmittedLetter, float(score)))
+                     for pk, letter, score in zip(letter_pks[changed_letters], submitted[changed_letters], letter_scores[changed_letters])],
+                    ['submitted_letter', 'score'], batch_size=1000
+                )
+                Exercise.objects.bulk_update(
+                    [Exercise(pk=int(pk), score=saved_score(Exercise, float(score)), scored_date=scored_date)
+                     for pk, score in zip(exercise_pks[rescored_exercises], saved_exercise_scores[rescored_exercises])],
+                    ['score', 'scored_date'], batch_size=1000
+                )
+        return {
+            'exercises': len(batch),
+            'letters': len(letters),
+            'changed_exercises': int(changed_exercises.sum()),
+            'changed_letters': int(changed_letters.sum()),
+            'exercise_changes': [(int(pk), old, new) for pk, old, new in zip(
+                exercise_pks[changed_exercises], np.nan_to_num(old_exercise_scores[changed_exercises]), exercise_scores[changed_exercises]
+            )],
+        }
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from exercises.ocr_server import OCRServer, OCRWorker
+from exercises.ai_models import create_paddle_ocr
+
+
+# a single process that holds the PaddleOCR models for all the server workers
+# run it with the same OCR_SERVER_SOCKET as the server: python manage.py run_ocr_server
+class Command(BaseCommand):
+    help = "Serves PaddleOCR on a unix socket to all the server workers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=settings.OCR_SERVER_SOCKET,
+                            help="Path of the unix socket(OCR_SERVER_SOCKET by default)")
+        parser.add_argument('--threads', type=int, default=settings.OCR_SERVER_THREADS,
+                            help="How many models run the requests at once(OCR_SERVER_THREADS by default)")
+
+    def handle(self, *args, **options):
+        if not options['socket']:
+            raise CommandError("Set OCR_SERVER_SOCKET or pass --socket")
+        if options['threads'] < 1:
+            raise CommandError("--threads must be at least 1")
+        with OCRServer(options['socket'], OCRWorker(create_paddle_ocr, options['threads'])) as server:
+            self.stdout.write(f"OCR server is listening on {options['socket']} with {options['threads']} models")
+            server.serve_forever()
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exercises.jobs import claim_next_job, run_job, requeue_stale_jobs
+
+
+# the worker of the asynchronous submission mode
+# run it next to the server: python manage.py run_submission_worker
+class Command(BaseCommand):
+    help = "Scores the exercises that were submitted in the asynchronous mode"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait before polling again when there are no pending jobs")
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help="Seconds after which a running job is considered abandoned and queued again")
+        parser.add_argument('--once', action='store_true',
+                            help="Run the pending jobs and exit instead of polling forever")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Submission worker started")
+        # another worker may die while this one keeps running - its jobs are looked for again every stale_after / 2
+        next_requeue = 0.0
+        while True:
+            if time.monotonic() >= next_requeue:
+                requeued = requeue_stale_jobs(options['stale_after'])
+                if requeued:
+                    self.stdout.write(f"Queued again {requeued} abandoned jobs")
+                next_requeue = time.monotonic() + options['stale_after'] / 2
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            job = run_job(job)
+            self.stdout.write(f"Job {job.id} of exercise {job.exercise_id}: {job.status}")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from exercises.ai_models import warm_up_models
+
+
+# loads the models ahead of their first use(also downloads PaddleOCR's model files if they are missing)
+class Command(BaseCommand):
+    help = "Loads the VLM clients and the PaddleOCR model"
+
+    def handle(self, *args, **options):
+        loaded_models = warm_up_models()
+        self.stdout.write(f"Loaded models: {', '.join(loaded_models) if loaded_models else 'none'}")
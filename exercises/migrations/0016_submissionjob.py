@@ -0,0 +1,27 @@
+# Generated by Django 4.2.17 on 2026-10-18 08:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0015_categorizedword_alter_exercise_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('started_date', models.DateTimeField(blank=True, null=True)),
+                ('finished_date', models.DateTimeField(blank=True, null=True)),
+                ('exercise', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='submission_job', to='exercises.exercise')),
+            ],
+        ),
+    ]
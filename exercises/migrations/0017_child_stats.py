@@ -0,0 +1,71 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_remove_childprofile_exercise_language'),
+        ('exercises', '0016_submissionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChildLevelStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('letters', 'Letters'), ('words', 'Words'), ('category', 'Category')], max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='level_stats', to='accounts.childprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChildLetterStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('letter', models.CharField(max_length=1)),
+                ('count', models.IntegerField(default=0)),
+                ('correct_score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='letter_stats', to='accounts.childprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChildLetterConfusion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expected_letter', models.CharField(max_length=1)),
+                ('submitted_letter', models.CharField(max_length=1)),
+                ('count', models.IntegerField(default=0)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='letter_confusions', to='accounts.childprofile')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChildDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('score_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('child', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='accounts.childprofile')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='childlevelstats',
+            constraint=models.UniqueConstraint(fields=('child', 'level'), name='unique_child_level_stats'),
+        ),
+        migrations.AddConstraint(
+            model_name='childletterstats',
+            constraint=models.UniqueConstraint(fields=('child', 'letter'), name='unique_child_letter_stats'),
+        ),
+        migrations.AddConstraint(
+            model_name='childletterconfusion',
+            constraint=models.UniqueConstraint(fields=('child', 'expected_letter', 'submitted_letter'), name='unique_child_letter_confusion'),
+        ),
+        migrations.AddConstraint(
+            model_name='childdailystats',
+            constraint=models.UniqueConstraint(fields=('child', 'day'), name='unique_child_daily_stats'),
+        ),
+    ]
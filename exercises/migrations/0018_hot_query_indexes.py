@@ -0,0 +1,33 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0017_child_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['child', '-submission_date'], name='exercise_child_submission_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['child', 'level'], name='exercise_child_level_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(condition=models.Q(('submission_date__isnull', True)), fields=['child'], name='exercise_unsubmitted_child_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submissionjob',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_date'], name='job_pending_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='submittedletter',
+            index=models.Index(fields=['exercise', 'position'], name='letter_exercise_position_idx'),
+        ),
+    ]
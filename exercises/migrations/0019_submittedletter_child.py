@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+# copy the child of the exercise to its letters
+def copy_exercise_child_to_letters(apps, schema_editor):
+    Exercise = apps.get_model('exercises', 'Exercise')
+    SubmittedLetter = apps.get_model('exercises', 'SubmittedLetter')
+    letter_exercise = Exercise.objects.filter(pk=OuterRef('exercise_id'))
+    SubmittedLetter.objects.update(child_id=Subquery(letter_exercise.values('child_id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_remove_childprofile_exercise_language'),
+        ('exercises', '0018_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submittedletter',
+            name='child',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.childprofile'),
+        ),
+        migrations.RunPython(copy_exercise_child_to_letters, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='submittedletter',
+            name='child',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.childprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='submittedletter',
+            index=models.Index(fields=['child', 'expected_letter'], name='letter_child_expected_idx'),
+        ),
+    ]
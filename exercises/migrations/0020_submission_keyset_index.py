@@ -0,0 +1,21 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0019_submittedletter_child'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='exercise',
+            name='exercise_child_submission_idx',
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['child', '-submission_date', '-id'], name='exercise_child_submission_idx'),
+        ),
+    ]
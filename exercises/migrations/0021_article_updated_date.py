@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0020_submission_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
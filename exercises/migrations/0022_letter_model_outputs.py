@@ -0,0 +1,38 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0021_article_updated_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='text_similarity',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submittedletter',
+            name='ocr_letter',
+            field=models.CharField(blank=True, default='', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='submittedletter',
+            name='ocr_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submittedletter',
+            name='vlm_letter',
+            field=models.CharField(blank=True, default='', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='submittedletter',
+            name='vlm_score',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.17 on 2026-10-18 09:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0022_letter_model_outputs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelsAnalysis',
+            fields=[
+                ('exercise', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='models_analysis', serialize=False, to='exercises.exercise')),
+                ('vlm_provider', models.CharField(blank=True, max_length=20, null=True)),
+                ('vlm_answer_parts', models.JSONField(default=list)),
+                ('ocr_text', models.CharField(blank=True, null=True)),
+                ('ocr_scores', models.BinaryField(default=bytes)),
+                ('analysis_version', models.CharField(max_length=50)),
+                ('vlm_latency_ms', models.FloatField(blank=True, null=True)),
+                ('ocr_latency_ms', models.FloatField(blank=True, null=True)),
+                ('cached', models.BooleanField(default=False)),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.17 on 2026-10-18 10:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_childprofile_recent_scores'),
+        ('exercises', '0023_models_analysis'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='childdailystats',
+            name='child',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='accounts.childprofile'),
+        ),
+        migrations.AlterField(
+            model_name='childletterconfusion',
+            name='child',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='letter_confusions', to='accounts.childprofile'),
+        ),
+        migrations.AlterField(
+            model_name='childletterstats',
+            name='child',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='letter_stats', to='accounts.childprofile'),
+        ),
+        migrations.AlterField(
+            model_name='childlevelstats',
+            name='child',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='level_stats', to='accounts.childprofile'),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='child',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='accounts.childprofile'),
+        ),
+        migrations.AlterField(
+            model_name='submittedletter',
+            name='child',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='accounts.childprofile'),
+        ),
+        migrations.AlterField(
+            model_name='submittedletter',
+            name='exercise',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='exercises.exercise'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.17 on 2026-10-18 10:04
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+# the exercises that were already scored were scored when they were submitted
+def copy_submission_date(apps, schema_editor):
+    Exercise = apps.get_model('exercises', 'Exercise')
+    Exercise.objects.exclude(score=None).update(scored_date=F('submission_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exercises', '0024_drop_redundant_fk_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='scored_date',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_submission_date, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
+import numpy as np
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from accounts.models import ChildProfile
 
+# the packed scores of ModelsAnalysis.ocr_scores
+OCR_SCORES_DTYPE = '<f4'
+
 # decimal field for score - that removes the need of the score got to fit the decimal places - will rounded it to fit 
 class ScoreRoundingDecimalField(models.DecimalField):
     def validate_precision(self, value):
@@ -23,7 +27,8 @@ class Exercise(models.Model):
         PLACE = "place"
 
 
-    child = models.ForeignKey(ChildProfile ,on_delete=models.CASCADE)
+    # no index of its own - the indexes below start with the child
+    child = models.ForeignKey(ChildProfile ,on_delete=models.CASCADE, db_index=False)
     requested_text = models.CharField()
     submitted_text = models.CharField()
     
@@ -37,16 +42,47 @@ class Exercise(models.Model):
     submission_date = models.DateTimeField(null=True, blank=True)
 
     feedback = models.TextField(null=True, blank=True)
+    # the best similarity of the models' texts to the requested text(levenshtein ratio) - half of the score
+    text_similarity = models.FloatField(null=True, blank=True)
+    # when the exercise or its letters were last scored(or scored again by rescore_exercises) - the submissions' validators use it
+    scored_date = models.DateTimeField(null=True, blank=True)
+
+    # the indexes of the hot queries(python manage.py explain_hot_queries)
+    class Meta:
+        indexes = [
+            # the child's latest exercises and the list of the child's submissions
+            models.Index(fields=['child', '-submission_date', '-id'], name='exercise_child_submission_idx'),
+            models.Index(fields=['child', 'level'], name='exercise_child_level_idx'),
+            # the exercise that the child didn't submit yet - only a few rows are in it
+            models.Index(fields=['child'], condition=models.Q(submission_date__isnull=True), name='exercise_unsubmitted_child_idx'),
+        ]
 
     def __str__(self):
         return self.child.user.username + " level:" + self.level + " category:" + self.category + " generated at:" + str(self.generated_date)
 
 class SubmittedLetter(models.Model):
-    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    # no indexes of their own - the indexes below start with them
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, db_index=False)
+    # copied from the exercise when it is scored - so the letters' statistics don't need to join the exercises
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, db_index=False)
     submitted_letter = models.CharField(max_length=1)
     expected_letter = models.CharField(max_length=1)
     score = ScoreRoundingDecimalField(validators=[MinValueValidator(0.0), MaxValueValidator(1.0)], max_digits=3, decimal_places=2)
     position = models.IntegerField()
+    # the letter and the confidence each model recognized in this position(empty for the letters scored before they were kept)
+    vlm_letter = models.CharField(max_length=1, blank=True, default='')
+    vlm_score = models.FloatField(null=True, blank=True)
+    ocr_letter = models.CharField(max_length=1, blank=True, default='')
+    ocr_score = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the letters of an exercise by their order
+            models.Index(fields=['exercise', 'position'], name='letter_exercise_position_idx'),
+            # the child's letters grouped by the expected letter
+            models.Index(fields=['child', 'expected_letter'], name='letter_child_expected_idx'),
+        ]
+
     def __str__(self):
         return "Expected:" + self.expected_letter + " submitted:" + self.submitted_letter + " score:" + str(self.score) + " position:" + str(self.position)
 
@@ -61,5 +97,125 @@ class Article(models.Model):
     title = models.CharField(max_length=200)
     description = models.CharField()
     link = models.URLField()
+    # the articles list's Last-Modified(conditional.py)
+    updated_date = models.DateTimeField(auto_now=True)
+    def __str__(self):
+        return self.title + " " + self.link
+
+# a queued scoring job for an exercise submitted in the asynchronous mode
+# the worker(python manage.py run_submission_worker) picks the pending jobs by their creation order
+class SubmissionJob(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    exercise = models.OneToOneField(Exercise, on_delete=models.CASCADE, related_name="submission_job")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, db_index=True)
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    created_date = models.DateTimeField(auto_now_add=True)
+    started_date = models.DateTimeField(null=True, blank=True)
+    finished_date = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker takes the oldest pending job
+            models.Index(fields=['created_date'], condition=models.Q(status='pending'), name='job_pending_created_idx'),
+        ]
+
+    def __str__(self):
+        return "Job of exercise:" + str(self.exercise_id) + " status:" + self.status + " attempts:" + str(self.attempts)
+
+# what the models answered for a submission - the exercise is scored from it(views.score_exercise)
+# so the scoring can be replayed(after the scoring rules change or in a benchmark) without calling the models again
+class ModelsAnalysis(models.Model):
+    exercise = models.OneToOneField(Exercise, on_delete=models.CASCADE, primary_key=True, related_name="models_analysis")
+    # the provider that answered first(None if none of them answered)
+    vlm_provider = models.CharField(max_length=20, null=True, blank=True)
+    vlm_answer_parts = models.JSONField(default=list)
+    # None - PaddleOCR didn't recognize anything(or didn't run)
+    ocr_text = models.CharField(null=True, blank=True)
+    # PaddleOCR's confidence in each character - packed little endian float32(4 bytes per character)
+    ocr_scores = models.BinaryField(default=bytes)
+    # the prompts' version and the image preprocessing(views.VLM_PROMPT_VERSION and preprocessing_signature)
+    analysis_version = models.CharField(max_length=50)
+    # how long each model took - empty if the analysis was taken from the cache
+    vlm_latency_ms = models.FloatField(null=True, blank=True)
+    ocr_latency_ms = models.FloatField(null=True, blank=True)
+    cached = models.BooleanField(default=False)
+    created_date = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def VLM_guess(self):
+        return self.vlm_answer_parts[0] if self.vlm_answer_parts else None
+
+    def get_ocr_scores(self):
+        return np.frombuffer(self.ocr_scores, dtype=OCR_SCORES_DTYPE).tolist()
+
+    def set_ocr_scores(self, scores):
+        self.ocr_scores = np.asarray(scores, dtype=OCR_SCORES_DTYPE).tobytes()
+
+    def __str__(self):
+        return "Analysis of exercise:" + str(self.exercise_id) + " provider:" + str(self.vlm_provider)
+
+
+# the statistics of each child are kept up to date with every submission(stats.py)
+# so the stats endpoint doesn't need to go over all of the child's exercises
+# python manage.py backfill_child_stats - builds them again from the exercises
+
+# each letter the child was asked to write - how many times and the sum of its scores when it was written correctly
+class ChildLetterStats(models.Model):
+    # the unique constraint's index starts with the child
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name="letter_stats", db_index=False)
+    letter = models.CharField(max_length=1)
+    count = models.IntegerField(default=0)
+    correct_score_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['child', 'letter'], name='unique_child_letter_stats')]
+
+    def __str__(self):
+        return str(self.child) + " letter:" + self.letter + " count:" + str(self.count)
+
+class ChildLevelStats(models.Model):
+    # the unique constraint's index starts with the child
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name="level_stats", db_index=False)
+    level = models.CharField(max_length=50, choices=ChildProfile.ExerciseLevel.choices)
+    count = models.IntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['child', 'level'], name='unique_child_level_stats')]
+
+    def __str__(self):
+        return str(self.child) + " level:" + self.level + " count:" + str(self.count)
+
+class ChildDailyStats(models.Model):
+    # the unique constraint's index starts with the child
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name="daily_stats", db_index=False)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+    score_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['child', 'day'], name='unique_child_daily_stats')]
+
+    def __str__(self):
+        return str(self.child) + " day:" + str(self.day) + " count:" + str(self.count)
+
+# how many times the child wrote another letter instead of the expected one
+class ChildLetterConfusion(models.Model):
+    # the unique constraint's index starts with the child
+    child = models.ForeignKey(ChildProfile, on_delete=models.CASCADE, related_name="letter_confusions", db_index=False)
+    expected_letter = models.CharField(max_length=1)
+    submitted_letter = models.CharField(max_length=1)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['child', 'expected_letter', 'submitted_letter'], name='unique_child_letter_confusion')]
+
     def __str__(self):
-        return self.title + " " + self.link
\ No newline at end of file
+        return str(self.child) + " expected:" + self.expected_letter + " submitted:" + self.submitted_letter + " count:" + str(self.count)
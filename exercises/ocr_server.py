@@ -0,0 +1,131 @@
+import io
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+
+import numpy as np
+from django.conf import settings
+
+
+# the messages on the socket are prefixed by their length
+# request - the image as a .npy array, response - the PaddleOCR results as json
+LENGTH_PREFIX = struct.Struct('!I')
+
+
+def send_message(sock, data):
+    sock.sendall(LENGTH_PREFIX.pack(len(data)) + data)
+
+def receive_message(sock):
+    length, = LENGTH_PREFIX.unpack(receive_exactly(sock, LENGTH_PREFIX.size))
+    return receive_exactly(sock, length)
+
+def receive_exactly(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("The OCR server connection was closed")
+        data.extend(chunk)
+    return bytes(data)
+
+# the results of PaddleOCR have numpy numbers and arrays in them
+def to_json_value(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Can't send {type(value)} as json")
+
+
+class OCRRequest:
+    def __init__(self, image):
+        self.image = image
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+# a pool of model threads - the requests of all the connections wait in a queue for the first free model
+# PaddleOCR's ocr() takes one image per call and isn't safe to share between threads, so each thread has its own model
+# the threads run the requests at the same time - PaddleOCR's inference releases the GIL
+class OCRWorker:
+    def __init__(self, create_ocr, threads=1):
+        self.create_ocr = create_ocr
+        self.threads = threads
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.done_count = 0
+        # the most requests that were waiting for a model at once and that were run at once
+        self.max_waiting = 0
+        self.running = 0
+        self.max_running = 0
+
+    def submit(self, image):
+        request = OCRRequest(image)
+        self.requests.put(request)
+        with self.lock:
+            self.max_waiting = max(self.max_waiting, self.requests.qsize())
+        request.done.wait()
+        if request.error is not None:
+            raise RuntimeError(request.error)
+        return request.results
+
+    def run_request(self, ocr, request):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            request.results = ocr.ocr(request.image, cls=True)
+        except Exception as e:
+            request.error = str(e)
+        with self.lock:
+            self.running -= 1
+            self.done_count += 1
+        request.done.set()
+
+    def run_forever(self):
+        ocr = self.create_ocr()
+        while True:
+            self.run_request(ocr, self.requests.get())
+
+    def start(self):
+        for i in range(self.threads):
+            threading.Thread(target=self.run_forever, name=f'ocr-worker-{i}', daemon=True).start()
+
+
+class OCRRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        image = np.load(io.BytesIO(receive_message(self.request)), allow_pickle=False)
+        try:
+            response = {'results': self.server.worker.submit(image)}
+        except Exception as e:
+            response = {'error': str(e)}
+        send_message(self.request, json.dumps(response, default=to_json_value).encode())
+
+
+class OCRServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, worker):
+        # a socket file left by a server that didn't shut down properly
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, OCRRequestHandler)
+        self.worker = worker
+        worker.start()
+
+
+# used by the server workers instead of a PaddleOCR model of their own
+def ocr_via_server(img_np, socket_path=None):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(settings.OCR_SERVER_TIMEOUT)
+        sock.connect(socket_path or settings.OCR_SERVER_SOCKET)
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(img_np), allow_pickle=False)
+        send_message(sock, buffer.getvalue())
+        response = json.loads(receive_message(sock))
+    if 'error' in response:
+        raise RuntimeError(response['error'])
+    return response['results']
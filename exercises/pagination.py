@@ -0,0 +1,70 @@
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# pages of the submissions from the newest one - ordered by (submission_date, id)
+# the cursor is the last submission of the previous page - the next page starts right after it
+# unlike offset pagination, the db reads only the rows of the page(using the child's submissions index)
+class SubmissionKeysetPagination(BasePagination):
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def encode_cursor(self, exercise):
+        position = f"{exercise.submission_date.isoformat()}|{exercise.pk}"
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            submission_date, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            submission_date = parse_datetime(submission_date)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            submission_date = None
+        if submission_date is None:
+            raise NotFound("Invalid cursor")
+        return submission_date, pk
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            submission_date, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(submission_date__lt=submission_date) | Q(submission_date=submission_date, pk__lt=pk))
+        # one more row than the page - to know if there is a next page
+        exercises = list(queryset.order_by('-submission_date', '-pk')[:page_size + 1])
+        self.next_cursor = self.encode_cursor(exercises[page_size - 1]) if len(exercises) > page_size else None
+        return exercises[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
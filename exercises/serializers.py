@@ -1,9 +1,18 @@
 from rest_framework import serializers
-from django.db.models import Case, When, Value, F
-from django.db.models import FloatField
+from django.db.models import Prefetch
 from .models import *
 
 
+# the letters of the exercises are fetched in one query for any number of exercises
+# lookup - the path to the letters from the queryset's model
+def prefetch_letters(lookup='submittedletter_set'):
+    return Prefetch(lookup, queryset=SubmittedLetter.objects.order_by('position'))
+
+# the letters of the exercise by position - uses the prefetched letters if there are any
+def get_ordered_letters(exercise):
+    return sorted(exercise.submittedletter_set.all(), key=lambda letter: letter.position)
+
+
 class ExerciseGenerationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Exercise
@@ -20,15 +29,17 @@ class ExerciseSubmitSerializer(serializers.ModelSerializer):
         read_only_fields = ('submitted_text', 'requested_text', 'submission_date', 'score', 'feedback', 'letter_scores')
     def get_letter_scores(self, obj):
         # an array of the scores for each letter by position
-        return list(SubmittedLetter.objects
-                    .filter(exercise=obj)
-                    .order_by('position')
-                    .annotate(
-                            new_score=Case(
-                                When(submitted_letter=F('expected_letter'), then = 1 - F('score')),
-                                default=Value(1),
-                                output_field=FloatField()
-                            )).values_list('new_score', flat=True))
+        # 1 - score for a correct letter and 1 for a wrong one
+        return [float(1 - letter.score) if letter.submitted_letter == letter.expected_letter else 1.0
+                for letter in get_ordered_letters(obj)]
+
+class SubmissionJobSerializer(serializers.ModelSerializer):
+    # the scored exercise - its score is empty until the job is done
+    result = ExerciseSubmitSerializer(source='exercise', read_only=True)
+    class Meta:
+        model = SubmissionJob
+        fields = ('id', 'exercise', 'status', 'attempts', 'error', 'created_date', 'started_date', 'finished_date', 'result')
+        read_only_fields = fields
 
 class ExerciseSerializer(serializers.ModelSerializer):
     letter_scores = serializers.SerializerMethodField()
@@ -38,17 +49,9 @@ class ExerciseSerializer(serializers.ModelSerializer):
     
     def get_letter_scores(self, obj):
         # an array of the scores for each letter by position
-        scores = list(
-            SubmittedLetter.objects
-            .filter(exercise=obj)
-            .order_by('position')
-            .annotate(
-                new_score=Case(
-                    When(submitted_letter=F('expected_letter'), then=F('score')),
-                    default=Value(0),
-                    output_field=FloatField()
-                )).values_list('new_score', flat=True))
-        return scores
+        # the score of a correct letter and 0 for a wrong one
+        return [float(letter.score) if letter.submitted_letter == letter.expected_letter else 0.0
+                for letter in get_ordered_letters(obj)]
 
 class ExerciseStatsSerializer(serializers.Serializer):
     letter_scores = serializers.ListField()
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import CategorizedWord
+from .word_index import invalidate_word_index
+
+
+@receiver(post_save, sender=CategorizedWord)
+@receiver(post_delete, sender=CategorizedWord)
+def categorized_word_changed(sender, **kwargs):
+    invalidate_word_index()
@@ -0,0 +1,175 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q, Sum, Count, Case, When, F, Value, DecimalField
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Exercise, SubmittedLetter, ChildLetterStats, ChildLevelStats, ChildDailyStats, ChildLetterConfusion
+
+LEVEL_ORDER = ['letters', 'words', 'category']
+TWO_DECIMAL_PLACES = Decimal('0.01')
+ROLLUP_MODELS = (ChildLetterStats, ChildLevelStats, ChildDailyStats, ChildLetterConfusion)
+
+
+# the scores are saved in the db rounded to 2 decimal places - the sums are of the saved values
+def saved_score(model, score):
+    return model._meta.get_field('score').to_python(score).quantize(TWO_DECIMAL_PLACES)
+
+# the avg rounded to 2 decimal places as a percentage
+def average_percentage(score_sum, count):
+    return 100 * (score_sum / count).quantize(TWO_DECIMAL_PLACES, rounding=ROUND_HALF_UP)
+
+
+# add to the counters of the child's rows(the rows that don't exist yet are created)
+# increments - {key: {field: amount}}, the key is a tuple of the values of key_fields
+# the same number of queries for any number of rows
+def increment_rollups(model, child_id, key_fields, increments):
+    if not increments:
+        return
+    model.objects.bulk_create(
+        [model(child_id=child_id, **dict(zip(key_fields, key))) for key in increments],
+        ignore_conflicts=True
+    )
+    keys_filter = Q()
+    for key in increments:
+        keys_filter |= Q(**dict(zip(key_fields, key)))
+    # lock the rows so two submissions of the same child don't override each other's counts
+    rows = list(model.objects.select_for_update().filter(keys_filter, child_id=child_id).order_by(*key_fields))
+    updated_fields = set()
+    for row in rows:
+        for field, amount in increments[tuple(getattr(row, key_field) for key_field in key_fields)].items():
+            setattr(row, field, getattr(row, field) + amount)
+            updated_fields.add(field)
+    model.objects.bulk_update(rows, updated_fields)
+
+
+# called in the transaction that saves the scored exercise and its letters
+def update_child_stats(exercise, submitted_letters):
+    exercise_score = saved_score(Exercise, exercise.score)
+    increment_rollups(ChildLevelStats, exercise.child_id, ('level',),
+                      {(exercise.level,): {'count': 1, 'score_sum': exercise_score}})
+    increment_rollups(ChildDailyStats, exercise.child_id, ('day',),
+                      {(timezone.localdate(exercise.submission_date),): {'count': 1, 'score_sum': exercise_score}})
+    letter_increments = {}
+    confusion_increments = {}
+    for letter in submitted_letters:
+        letter_increment = letter_increments.setdefault((letter.expected_letter,), {'count': 0, 'correct_score_sum': Decimal(0)})
+        letter_increment['count'] += 1
+        if letter.submitted_letter == letter.expected_letter:
+            letter_increment['correct_score_sum'] += saved_score(SubmittedLetter, letter.score)
+        elif letter.submitted_letter != '':
+            confusion_increments.setdefault((letter.expected_letter, letter.submitted_letter), {'count': 0})['count'] += 1
+    increment_rollups(ChildLetterStats, exercise.child_id, ('letter',), letter_increments)
+    increment_rollups(ChildLetterConfusion, exercise.child_id, ('expected_letter', 'submitted_letter'), confusion_increments)
+
+
+def get_child_stats(child_id):
+    letter_stats = list(ChildLetterStats.objects.filter(child_id=child_id).order_by('letter'))
+    # the avg score of the child in each letter - if the letter wasn't guessed correctly it counts as 0
+    letter_scores = [{'letter': stats.letter, 'avg_score': average_percentage(stats.correct_score_sum, stats.count)}
+                     for stats in letter_stats]
+    # the avg score of the child in each level - sorted by the level order
+    level_scores = sorted(
+        [{'level': stats.level, 'avg_score': average_percentage(stats.score_sum, stats.count)}
+         for stats in ChildLevelStats.objects.filter(child_id=child_id)],
+        key=lambda x: LEVEL_ORDER.index(x['level'])
+    )
+    # the avg score of the child in each day
+    daily_scores = [{'day': stats.day, 'avg_score': average_percentage(stats.score_sum, stats.count), 'exercise_count': stats.count}
+                    for stats in ChildDailyStats.objects.filter(child_id=child_id).order_by('day')]
+
+    letter_appearances = {stats.letter: stats.count for stats in letter_stats}
+    often_confused_letters = []
+    already_added_letters = set()
+    confused_letters = ChildLetterConfusion.objects.filter(child_id=child_id).order_by('expected_letter', '-count')
+    for confusion in confused_letters:
+        expected_letter = confusion.expected_letter
+        # will want to add only the most confused letter with each letter
+        # it is the first in order in confused_letters because it is sorted by the confusion count
+        # goes over the other letters confused with the same one
+        if expected_letter not in already_added_letters:
+            already_added_letters.add(expected_letter)
+            letter_total_appearances = letter_appearances.get(expected_letter, 1)
+            confusion_percentage = round((confusion.count / letter_total_appearances) * 100, 0)
+            # if it is confused often - add the submitted letter and the confusion count to the list of confused letters
+            if confusion_percentage >= 65 and confusion.count >= 3:
+                often_confused_letters.append({
+                    'letter': expected_letter,
+                    'confused_with': confusion.submitted_letter,
+                    'times': confusion.count,
+                    'confusion_percentage': confusion_percentage
+                })
+
+    return {
+        'letter_scores': letter_scores,
+        'level_scores': level_scores,
+        'daily_scores': daily_scores,
+        'often_confused_letters': often_confused_letters
+    }
+
+
+# the statistics of a child are kept in the default cache with the version of the child's submissions
+# the version(the stats' ETag) makes an entry of another server worker that wasn't invalidated count as stale
+def child_stats_cache_key(child_id):
+    return f"child_stats:{child_id}"
+
+def get_cached_child_stats(child_id, version):
+    cached = caches['default'].get(child_stats_cache_key(child_id))
+    if cached is not None and cached['version'] == version:
+        return cached['stats']
+    stats = get_child_stats(child_id)
+    caches['default'].set(child_stats_cache_key(child_id), {'version': version, 'stats': stats}, settings.STATS_CACHE_TTL)
+    return stats
+
+def invalidate_child_stats(child_id):
+    caches['default'].delete(child_stats_cache_key(child_id))
+
+
+# builds the statistics again from the scored exercises(of all the children if child_ids is None)
+def rebuild_child_stats(child_ids=None):
+    exercises = Exercise.objects.filter(score__isnull=False)
+    letters = SubmittedLetter.objects.all()
+    if child_ids is not None:
+        exercises = exercises.filter(child_id__in=child_ids)
+        letters = letters.filter(child_id__in=child_ids)
+    with transaction.atomic():
+        for model in ROLLUP_MODELS:
+            rows = model.objects.all()
+            if child_ids is not None:
+                rows = rows.filter(child_id__in=child_ids)
+            rows.delete()
+
+        ChildLevelStats.objects.bulk_create([
+            ChildLevelStats(child_id=row['child'], level=row['level'], count=row['count'], score_sum=row['score_sum'])
+            for row in exercises.values('child', 'level').annotate(count=Count('id'), score_sum=Sum('score'))
+        ])
+        ChildDailyStats.objects.bulk_create([
+            ChildDailyStats(child_id=row['child'], day=row['day'], count=row['count'], score_sum=row['score_sum'])
+            for row in (exercises.filter(submission_date__isnull=False)
+                        .annotate(day=TruncDate('submission_date'))
+                        .values('child', 'day').annotate(count=Count('id'), score_sum=Sum('score')))
+        ])
+        ChildLetterStats.objects.bulk_create([
+            ChildLetterStats(child_id=row['child'], letter=row['expected_letter'], count=row['count'],
+                             correct_score_sum=row['correct_score_sum'])
+            for row in letters.values('child', 'expected_letter').annotate(
+                count=Count('id'),
+                correct_score_sum=Sum(Case(
+                    When(expected_letter=F('submitted_letter'), then=F('score')),
+                    default=Value(Decimal(0)),
+                    output_field=DecimalField()
+                )))
+        ])
+        ChildLetterConfusion.objects.bulk_create([
+            ChildLetterConfusion(child_id=row['child'], expected_letter=row['expected_letter'],
+                                 submitted_letter=row['submitted_letter'], count=row['count'])
+            for row in (letters.exclude(expected_letter=F('submitted_letter')).exclude(submitted_letter='')
+                        .values('child', 'expected_letter', 'submitted_letter').annotate(count=Count('id')))
+        ])
+    # the cached statistics of the rebuilt children are built again on their next request
+    if child_ids is None:
+        child_ids = exercises.values_list('child_id', flat=True).distinct()
+    caches['default'].delete_many([child_stats_cache_key(child_id) for child_id in child_ids])
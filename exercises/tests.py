@@ -1,8 +1,50 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+import numpy as np
+from PIL import Image
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework import status
+from accounts.models import AdultProfile, User
 from accounts.tests import BaseTestCase
-from .models import Exercise, Article
+from .jobs import MAX_JOB_ATTEMPTS, claim_next_job, requeue_stale_jobs, run_job
+from .views import evaluate_submission, get_models_analysis, score_recognized_text
+from .models import Exercise, Article, SubmissionJob, SubmittedLetter, CategorizedWord, ChildLevelStats, ModelsAnalysis
+from .serializers import ExerciseSerializer, ExerciseSubmitSerializer, prefetch_letters, get_ordered_letters
+from . import views, word_index
+from .vlm_providers import VLMProvider, race_providers
+from .ocr_server import OCRServer, OCRWorker, ocr_via_server
+from . import ai_models
+from .image_processing import preprocess_image, image_to_data_url
+from .timing import timing_stats
+from .tracing import is_tracing, sample_trace
+
+# keep the uploaded images in memory instead of uploading them to cloudinary
+IN_MEMORY_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+def create_test_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (60, 20), "white").save(buffer, format="PNG")
+    return SimpleUploadedFile("test.png", buffer.getvalue(), content_type="image/png")
 
 
 class ChildExerciseTests(BaseTestCase):
@@ -39,6 +81,547 @@ class ChildExerciseTests(BaseTestCase):
         # check if the new exercise is not the same as the old one
         self.assertNotEqual(response.data["id"], self.exercise.id)
 
+def fake_VLM_answer(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+# the models' analysis of a submission - get_models_analysis's result
+def fake_analysis(VLM_guess, paddleocr_text=None, paddleocr_scores=()):
+    analysis = ModelsAnalysis(vlm_provider="azure", vlm_answer_parts=[VLM_guess] if VLM_guess else [],
+                              ocr_text=paddleocr_text, analysis_version="test")
+    analysis.set_ocr_scores(paddleocr_scores)
+    return analysis
+
+# the child submitted a new exercise and the models analyzed it as the given analysis
+def submit_exercise(child, requested_text, analysis, **fields):
+    exercise = Exercise.objects.create(child=child, requested_text=requested_text, **fields)
+    with patch("exercises.views.get_models_analysis", return_value=analysis):
+        evaluate_submission(exercise, timezone.now())
+    return exercise
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class AsyncSubmissionTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exercise = Exercise.objects.create(
+            child=self.child_profile,
+            requested_text="test"
+        )
+
+    def submit(self):
+        url = reverse("exercise_submit_async", args=[self.exercise.id])
+        self.client.force_authenticate(user=self.child_user)
+        return self.client.put(url, {"submitted_image": create_test_image()}, format="multipart")
+
+    def test_async_submission_queues_job(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], SubmissionJob.Status.PENDING)
+        self.exercise.refresh_from_db()
+        self.assertIsNotNone(self.exercise.submission_date)
+        self.assertIsNone(self.exercise.score)
+        # the exercise can't be submitted twice
+        self.assertEqual(self.submit().status_code, status.HTTP_403_FORBIDDEN)
+
+    @patch("exercises.views.get_models_analysis", return_value=fake_analysis("test"))
+    def test_worker_scores_job(self, mocked_analysis):
+        job_id = self.submit().data["id"]
+        job = claim_next_job()
+        self.assertEqual(job.id, job_id)
+        self.assertEqual(job.status, SubmissionJob.Status.RUNNING)
+        run_job(job)
+        # no more pending jobs
+        self.assertIsNone(claim_next_job())
+        response = self.client.get(reverse("submission_job_status", args=[job_id]), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], SubmissionJob.Status.DONE)
+        self.assertEqual(response.data["result"]["submitted_text"], "test")
+        self.assertEqual(SubmittedLetter.objects.filter(exercise=self.exercise).count(), 4)
+
+    @patch("exercises.views.get_models_analysis", return_value=fake_analysis("test"))
+    def test_worker_requeues_jobs_abandoned_while_it_runs(self, mocked_analysis):
+        job_id = self.submit().data["id"]
+        SubmissionJob.objects.filter(pk=job_id).update(status=SubmissionJob.Status.RUNNING)
+        sleeps = []
+
+        # the job's worker dies after the worker started - then the worker is stopped on its next idle poll
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 1:
+                SubmissionJob.objects.filter(pk=job_id).update(started_date=timezone.now() - timedelta(seconds=10))
+            else:
+                raise KeyboardInterrupt
+
+        with patch("exercises.management.commands.run_submission_worker.time.sleep", side_effect=sleep), \
+                self.assertRaises(KeyboardInterrupt):
+            call_command("run_submission_worker", stale_after=0, stdout=io.StringIO())
+        self.assertEqual(SubmissionJob.objects.get(pk=job_id).status, SubmissionJob.Status.DONE)
+
+    def test_abandoned_job_without_attempts_left_fails(self):
+        job_id = self.submit().data["id"]
+        SubmissionJob.objects.filter(pk=job_id).update(status=SubmissionJob.Status.RUNNING, attempts=MAX_JOB_ATTEMPTS,
+                                                       started_date=timezone.now() - timedelta(seconds=10))
+        self.assertEqual(requeue_stale_jobs(0), 0)
+        job = SubmissionJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, SubmissionJob.Status.FAILED)
+        self.assertIsNotNone(job.error)
+        self.assertIsNone(claim_next_job())
+
+    @patch("exercises.views.get_models_analysis", return_value=fake_analysis("test"))
+    def test_job_scored_before_its_worker_died_not_scored_again(self, mocked_analysis):
+        self.submit()
+        run_job(claim_next_job())
+        # the worker died after the exercise was scored - before the job was marked as done
+        SubmissionJob.objects.update(status=SubmissionJob.Status.PENDING)
+        run_job(claim_next_job())
+        self.assertEqual(mocked_analysis.call_count, 1)
+        self.assertEqual(SubmissionJob.objects.get().status, SubmissionJob.Status.DONE)
+        self.assertEqual(ChildLevelStats.objects.get(child=self.child_profile).count, 1)
+        self.child_profile.refresh_from_db()
+        self.assertEqual(len(self.child_profile.recent_scores), 1)
+
+    def test_job_status_of_another_child(self):
+        job_id = self.submit().data["id"]
+        # the adult isn't a child - can't poll the job
+        self.client.force_authenticate(user=self.adult_user)
+        response = self.client.get(reverse("submission_job_status", args=[job_id]), format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES, OCR_SERVER_SOCKET=None)
+class SubmissionTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['analysis'].clear()
+        self.exercise = Exercise.objects.create(child=self.child_profile, requested_text="test")
+
+    @patch("exercises.views.get_paddle_ocr", return_value=None)
+    @patch("exercises.views.get_VLM_answer", return_value=(fake_VLM_answer("1. test 2. Nice and clear letters"), "azure"))
+    def test_submission_analyzed_from_uploaded_bytes(self, get_VLM_answer, get_paddle_ocr):
+        url = reverse("exercise_submit", args=[self.exercise.id])
+        self.client.force_authenticate(user=self.child_user)
+        response = self.client.put(url, {"submitted_image": create_test_image()}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["submitted_text"], "test")
+        # the VLM got the image inside the request instead of its url in the storage
+        VLM_prompt, image_url = get_VLM_answer.call_args.args
+        self.assertTrue(image_url.startswith("data:image/jpeg;base64,"))
+        # the image was still saved in the storage
+        self.exercise.refresh_from_db()
+        self.assertTrue(self.exercise.submitted_image.storage.exists(self.exercise.submitted_image.name))
+        self.assertIsNotNone(self.exercise.submission_date)
+
+    @patch("exercises.views.get_paddle_ocr", return_value=None)
+    @patch("exercises.views.get_VLM_answer", return_value=(fake_VLM_answer("1. test 2. Nice and clear letters"), "azure"))
+    def test_submission_stages_timed(self, get_VLM_answer, get_paddle_ocr):
+        self.client.force_authenticate(user=self.child_user)
+        response = self.client.put(reverse("exercise_submit", args=[self.exercise.id]),
+                                   {"submitted_image": create_test_image()}, format="multipart")
+        stages = [stage.split(";")[0] for stage in response["Server-Timing"].split(", ")]
+        # storage_save ran on the storage's thread
+        for stage in ("storage_save", "image_decode", "scoring", "db_writes", "level_progression"):
+            self.assertIn(stage, stages)
+        self.assertGreaterEqual(timing_stats()["scoring"]["count"], 1)
+
+class SubmissionScoringTests(BaseTestCase):
+    def test_letters_saved_in_constant_queries(self):
+        # creating the exercise, the transaction's savepoint(2), the exercise update, a single insert of all the letters,
+        # the level, daily and letter statistics(3 each), locking and updating the child's level window and the models' analysis
+        with self.assertNumQueries(17):
+            short_exercise = submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        with self.assertNumQueries(17):
+            long_exercise = submit_exercise(self.child_profile, "elephants", fake_analysis("elephants"))
+        self.assertEqual(SubmittedLetter.objects.filter(exercise=short_exercise).count(), 3)
+        letters = SubmittedLetter.objects.filter(exercise=long_exercise).order_by('position')
+        self.assertEqual("".join(letter.submitted_letter for letter in letters), "elephants")
+
+    @override_settings(SUBMISSION_TRACE_SAMPLE_RATE=1)
+    def test_sampled_submission_traced(self):
+        # the traces are off unless the submission is in the sample
+        self.assertFalse(is_tracing())
+        with self.assertLogs("exercises.trace", level="INFO") as logs, sample_trace():
+            submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        self.assertTrue(any("Final score" in line for line in logs.output))
+
+    @override_settings(LEVEL_PROGRESSION={'letters': {'window': 3, 'promote': 0.7, 'demote': 0.3},
+                                          'words': {'window': 3, 'promote': 0.7, 'demote': 0.3}})
+    def test_level_window(self):
+        submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        self.child_profile.refresh_from_db()
+        self.assertEqual(self.child_profile.exercise_level, "letters")
+        self.assertEqual(len(self.child_profile.recent_scores), 2)
+        # the third perfect exercise fills the window - the child moves to the next level and the window starts over
+        submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        self.child_profile.refresh_from_db()
+        self.assertEqual(self.child_profile.exercise_level, "words")
+        self.assertEqual(self.child_profile.recent_scores, [])
+        self.assertEqual(self.child_profile.recent_score_sum, 0)
+        # an exercise of the previous level doesn't count in the new level's window
+        submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        self.child_profile.refresh_from_db()
+        self.assertEqual(self.child_profile.recent_scores, [])
+
+    @override_settings(LEVEL_PROGRESSION={'letters': {'window': 5, 'promote': 0.7, 'demote': 0.3},
+                                          'words': {'window': 3, 'promote': 0.7, 'demote': 0.3}})
+    def test_level_changed_by_adult_starts_window_over(self):
+        self.child_profile.recent_scores = ["0.95"] * 5
+        self.child_profile.recent_score_sum = Decimal("4.75")
+        self.child_profile.save()
+        self.client.force_authenticate(user=self.adult_user)
+        response = self.client.patch(reverse("child-detail", args=[self.child_user.id]), {"exercise_level": "words"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.child_profile.refresh_from_db()
+        self.assertEqual(self.child_profile.exercise_level, "words")
+        self.assertEqual(self.child_profile.recent_scores, [])
+        self.assertEqual(self.child_profile.recent_score_sum, 0)
+        # the next submission is the first one in the words' window - its low score doesn't move the child back
+        submit_exercise(self.child_profile, "cat", fake_analysis("dog"), level="words")
+        self.child_profile.refresh_from_db()
+        self.assertEqual(self.child_profile.exercise_level, "words")
+        self.assertEqual(len(self.child_profile.recent_scores), 1)
+
+    def test_level_window_replaces_oldest_score(self):
+        self.child_profile.recent_scores = ["0.20", "0.50", "0.50", "0.50", "0.50", "0.50", "0.50", "0.50", "0.50", "0.50"]
+        self.child_profile.recent_score_sum = Decimal("4.70")
+        self.child_profile.save()
+        self.assertFalse(self.child_profile.add_recent_score(0.6))
+        self.assertEqual(self.child_profile.recent_scores[0], "0.60")
+        self.assertEqual(self.child_profile.recent_score_index, 1)
+        self.assertEqual(self.child_profile.recent_score_sum, Decimal("5.10"))
+
+    def test_letters_copy_exercise_child(self):
+        exercise = submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        for letter in SubmittedLetter.objects.filter(exercise=exercise):
+            self.assertEqual(letter.child_id, self.child_profile.pk)
+
+class ScoringBenchmarkTests(SimpleTestCase):
+    def test_benchmark_replays_recorded_corpus(self):
+        with tempfile.TemporaryDirectory() as corpus_folder:
+            Image.new("RGB", (60, 20), "white").save(os.path.join(corpus_folder, "cat.png"))
+            with open(os.path.join(corpus_folder, "corpus.json"), "w") as corpus_file:
+                json.dump([{"image": "cat.png", "requested_text": "cat", "level": "letters", "category": None,
+                            "VLM_answer": "1. cat 2. Nice and clear letters", "paddleocr_results": [None]}], corpus_file)
+            output = os.path.join(corpus_folder, "results.json")
+            call_command("benchmark_scoring", corpus_folder, iterations=2, output=output, stdout=io.StringIO())
+            with open(output) as results_file:
+                results = json.load(results_file)
+        self.assertEqual(results["submissions"], 2)
+        self.assertGreater(results["stages"]["score_exercise"]["p50_ms"], 0)
+        self.assertGreater(results["memory_peak_bytes"], 0)
+
+class BatchRescoringTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # (requested text, VLM guess, PaddleOCR text, PaddleOCR scores) - every rule of the letters' scoring
+        submissions = [("cat", "cat", "cat", [0.9, 0.8, 0.7]), ("bed", "ded", "bcd", [0.6, 0.4, 0.9]),
+                       ("dog", "do", "dgg", [0.5, 0.5, 0.5]), ("sun", "", "sum", [0.8, 0.7, 0.6])]
+        for requested_text, VLM_guess, paddleocr_text, paddleocr_scores in submissions:
+            submit_exercise(self.child_profile, requested_text, fake_analysis(VLM_guess, paddleocr_text, paddleocr_scores))
+
+    def rescore(self, *args):
+        output = io.StringIO()
+        call_command("rescore_exercises", *args, stdout=output)
+        return output.getvalue()
+
+    def test_same_scores_as_score_exercise(self):
+        scores = list(Exercise.objects.order_by("pk").values_list("score", flat=True))
+        output = self.rescore("--dry-run")
+        self.assertIn("4 exercises(12 letters)", output)
+        self.assertIn("0 exercises and 0 letters changed", output)
+        self.assertEqual(list(Exercise.objects.order_by("pk").values_list("score", flat=True)), scores)
+
+    def test_changed_weights_saved(self):
+        old_score_sum = ChildLevelStats.objects.get(child=self.child_profile).score_sum
+        with patch("exercises.batch_scoring.VLM_WEIGHT", 0.5), patch("exercises.batch_scoring.PADDLEOCR_WEIGHT", 0.5):
+            self.assertIn("Dry run", self.rescore("--dry-run"))
+            self.assertEqual(ChildLevelStats.objects.get(child=self.child_profile).score_sum, old_score_sum)
+            self.rescore()
+            self.assertIn("0 exercises and 0 letters changed", self.rescore("--dry-run"))
+        cat = Exercise.objects.get(requested_text="cat")
+        # the letters that both models agreed on - 0.5 of each model's score
+        self.assertEqual([float(letter.score) for letter in get_ordered_letters(cat)], [0.95, 0.9, 0.85])
+        # the statistics were built from the new scores
+        self.assertNotEqual(ChildLevelStats.objects.get(child=self.child_profile).score_sum, old_score_sum)
+
+    def test_rescored_submissions_revalidated(self):
+        self.client.force_authenticate(user=self.adult_user)
+        urls = [reverse("exercise_stats", args=[self.child_profile.pk]),
+                reverse("submission_list_of_child", args=[self.child_profile.pk])]
+        etags = [self.client.get(url, format="json")["ETag"] for url in urls]
+        with patch("exercises.batch_scoring.VLM_WEIGHT", 0.5), patch("exercises.batch_scoring.PADDLEOCR_WEIGHT", 0.5):
+            self.rescore()
+        # the parents' dashboards get the new scores instead of 304
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        cat = Exercise.objects.get(requested_text="cat")
+        self.assertIn(str(cat.score), [result["score"] for result in response.data["results"]])
+
+class ModelsAnalysisTests(BaseTestCase):
+    def test_analysis_saved_with_submission(self):
+        exercise = submit_exercise(self.child_profile, "bed", fake_analysis("ded", "bcd", [0.6, 0.4, 0.9]))
+        analysis = ModelsAnalysis.objects.get(exercise=exercise)
+        self.assertEqual(analysis.vlm_answer_parts, ["ded"])
+        self.assertEqual(analysis.ocr_text, "bcd")
+        # 4 bytes per score
+        self.assertEqual(len(analysis.ocr_scores), 12)
+        self.assertEqual(np.round(analysis.get_ocr_scores(), 6).tolist(), [0.6, 0.4, 0.9])
+
+    def test_scoring_replayed_from_saved_analysis(self):
+        exercise = submit_exercise(self.child_profile, "dog", fake_analysis("do", "dgg", [0.5, 0.5, 0.5]))
+        analysis = ModelsAnalysis.objects.select_related("exercise").get(exercise=exercise)
+        # the stored record is enough - no models are called
+        letters, text_similarity, score = score_recognized_text(
+            exercise.requested_text, analysis.VLM_guess, analysis.ocr_text, analysis.get_ocr_scores()
+        )
+        exercise.refresh_from_db()
+        self.assertEqual(round(score, 2), float(exercise.score))
+        self.assertEqual(text_similarity, exercise.text_similarity)
+        self.assertEqual("".join(letter[1] for letter in letters), exercise.submitted_text)
+
+    def test_benchmark_of_stored_analyses(self):
+        submit_exercise(self.child_profile, "cat", fake_analysis("cat", "cat", [0.9, 0.8, 0.7]))
+        with tempfile.TemporaryDirectory() as output_folder:
+            output = os.path.join(output_folder, "results.json")
+            call_command("benchmark_scoring", stored=10, iterations=2, output=output, stdout=io.StringIO())
+            with open(output) as results_file:
+                results = json.load(results_file)
+        self.assertEqual(results["submissions"], 2)
+        self.assertGreater(results["stages"]["score_recognized_text"]["p50_ms"], 0)
+
+class LetterScoresSerializationTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(3):
+            exercise = Exercise.objects.create(child=self.child_profile, requested_text="ab", submission_date=timezone.now(), score=0.5)
+            # saved out of order - the scores are by position
+            SubmittedLetter.objects.bulk_create([
+                SubmittedLetter(exercise=exercise, child=self.child_profile, expected_letter="b", submitted_letter="d", score=0.4, position=1),
+                SubmittedLetter(exercise=exercise, child=self.child_profile, expected_letter="a", submitted_letter="a", score=0.75, position=0),
+            ])
+
+    def test_list_in_constant_queries(self):
+        # the exercises and all of their letters
+        with self.assertNumQueries(2):
+            exercises = ExerciseSerializer(Exercise.objects.prefetch_related(prefetch_letters()), many=True).data
+        with self.assertNumQueries(2):
+            submitted_exercises = ExerciseSubmitSerializer(Exercise.objects.prefetch_related(prefetch_letters()), many=True).data
+        self.assertEqual([exercise["letter_scores"] for exercise in exercises], [[0.75, 0.0]] * 3)
+        self.assertEqual([exercise["letter_scores"] for exercise in submitted_exercises], [[0.25, 1.0]] * 3)
+
+    def test_retrieve_exercise_letter_scores(self):
+        exercise = Exercise.objects.first()
+        self.client.force_authenticate(user=self.adult_user)
+        response = self.client.get(reverse("exercise_retrieve_delete", args=[exercise.pk]), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["letter_scores"], [0.75, 0.0])
+
+@override_settings(OCR_SERVER_SOCKET=None)
+class ConcurrentAnalysisTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['analysis'].clear()
+        self.image_bytes = create_test_image().read()
+
+    @patch("exercises.views.get_paddle_ocr")
+    def test_models_run_at_the_same_time(self, get_paddle_ocr):
+        ocr_started = threading.Event()
+        VLM_started = threading.Event()
+
+        def ocr(img_np, cls):
+            ocr_started.set()
+            # the VLM's request is still running while PaddleOCR works
+            self.assertTrue(VLM_started.wait(timeout=5))
+            return [[[None, "cat"]], [0.9, 0.8, 0.7]]
+
+        def VLM_answer(VLM_prompt, image_url):
+            VLM_started.set()
+            # PaddleOCR was started before the VLM's answer is waited for
+            self.assertTrue(ocr_started.wait(timeout=5))
+            return fake_VLM_answer("1. cat 2. Nice and clear letters"), "azure"
+
+        get_paddle_ocr.return_value = MagicMock(**{"ocr.side_effect": ocr})
+        exercise = Exercise.objects.create(child=self.child_profile, requested_text="cat")
+        with patch("exercises.views.get_VLM_answer", side_effect=VLM_answer):
+            analysis = get_models_analysis(exercise, self.image_bytes)
+        self.assertEqual(analysis.VLM_guess, "cat")
+        self.assertEqual(analysis.ocr_text, "cat")
+
+    @patch("exercises.views.get_paddle_ocr")
+    @patch("exercises.views.get_VLM_answer", return_value=(fake_VLM_answer("1. cat 2. No 3. - 4. Nice and clear letters"), "azure"))
+    def test_ocr_skipped_outside_category(self, get_VLM_answer, get_paddle_ocr):
+        get_paddle_ocr.return_value = MagicMock(**{"ocr.return_value": [[[None, "cat"]], [0.9, 0.8, 0.7]]})
+        exercise = Exercise.objects.create(child=self.child_profile, requested_text="dog", level="category", category="animal")
+        # PaddleOCR's thread is busy - its job for this exercise is still queued when the VLM answers "No"
+        release = threading.Event()
+        busy = views.paddleocr_executor.submit(release.wait, 5)
+        try:
+            analysis = get_models_analysis(exercise, self.image_bytes)
+        finally:
+            release.set()
+            busy.result()
+        self.assertIsNone(analysis.ocr_text)
+        self.assertEqual(analysis.get_ocr_scores(), [])
+        get_paddle_ocr.return_value.ocr.assert_not_called()
+        self.assertEqual(exercise.submitted_text, "cat")
+
+@override_settings(STORAGES=IN_MEMORY_STORAGES, OCR_SERVER_SOCKET=None)
+class AnalysisCacheTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['analysis'].clear()
+        self.image_bytes = create_test_image().read()
+
+    def create_submitted_exercise(self):
+        exercise = Exercise.objects.create(child=self.child_profile, requested_text="cat")
+        exercise.submitted_image.save("cat.png", ContentFile(self.image_bytes))
+        return exercise
+
+    @patch("exercises.views.get_paddle_ocr")
+    @patch("exercises.views.get_VLM_answer", return_value=(fake_VLM_answer("1. cat 2. Nice and clear letters"), "azure"))
+    def test_same_image_analyzed_once(self, get_VLM_answer, get_paddle_ocr):
+        get_paddle_ocr.return_value = MagicMock(**{"ocr.return_value": [None]})
+        first_analysis = get_models_analysis(self.create_submitted_exercise())
+        # the same photo was uploaded again for another exercise
+        exercise = self.create_submitted_exercise()
+        second_analysis = get_models_analysis(exercise)
+        self.assertEqual(first_analysis.VLM_guess, "cat")
+        self.assertIsNone(first_analysis.ocr_text)
+        self.assertFalse(first_analysis.cached)
+        # the second analysis has the first one's answers, without the models' latencies
+        self.assertTrue(second_analysis.cached)
+        self.assertEqual(second_analysis.vlm_answer_parts, first_analysis.vlm_answer_parts)
+        self.assertEqual(second_analysis.vlm_provider, "azure")
+        self.assertIsNone(second_analysis.vlm_latency_ms)
+        self.assertEqual(exercise.feedback, "Nice and clear letters")
+        self.assertEqual(get_VLM_answer.call_count, 1)
+        self.assertEqual(get_paddle_ocr.return_value.ocr.call_count, 1)
+
+    @patch("exercises.views.get_paddle_ocr", return_value=None)
+    @patch("exercises.views.get_VLM_answer", return_value=(None, None))
+    def test_failed_analysis_not_cached(self, get_VLM_answer, get_paddle_ocr):
+        get_models_analysis(self.create_submitted_exercise())
+        get_models_analysis(self.create_submitted_exercise())
+        self.assertEqual(get_VLM_answer.call_count, 2)
+
+    @patch("exercises.views.get_paddle_ocr")
+    @patch("exercises.views.get_VLM_answer", return_value=(fake_VLM_answer("1. cat 2. Nice and clear letters"), "azure"))
+    def test_analysis_with_failed_ocr_not_cached(self, get_VLM_answer, get_paddle_ocr):
+        get_paddle_ocr.return_value = MagicMock(**{"ocr.side_effect": RuntimeError("out of memory")})
+        self.assertIsNone(get_models_analysis(self.create_submitted_exercise()).ocr_text)
+        # PaddleOCR works again - the image is analyzed again instead of taking the analysis without its text
+        get_paddle_ocr.return_value = MagicMock(**{"ocr.return_value": [[[None, [("c", 0.9), ("a", 0.9), ("t", 0.9)]]], [0.9, 0.9, 0.9]]})
+        analysis = get_models_analysis(self.create_submitted_exercise())
+        self.assertFalse(analysis.cached)
+        self.assertEqual(analysis.ocr_text, "cat")
+        self.assertEqual(get_VLM_answer.call_count, 2)
+
+class WordsExerciseGenerationTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        word_index.invalidate_word_index()
+        self.child_profile.exercise_level = "words"
+        self.child_profile.save()
+        for category in Exercise.ExerciseCategory.values:
+            CategorizedWord.objects.create(word=category + "word", category=category)
+
+    def test_word_chosen_from_category(self):
+        self.client.force_authenticate(user=self.child_user)
+        response = self.client.post(reverse("exercise_generation"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["requested_text"], response.data["category"] + "word")
+
+    def test_word_index_loaded_once_and_invalidated(self):
+        with self.assertNumQueries(1):
+            word_index.get_random_word("animal")
+            word_index.get_random_word("color")
+        CategorizedWord.objects.filter(category="animal").delete()
+        CategorizedWord.objects.create(word="dog", category="animal")
+        self.assertEqual(word_index.get_random_word("animal"), "dog")
+
+class ExerciseStatsTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+
+    def get_stats(self):
+        self.client.force_authenticate(user=self.adult_user)
+        response = self.client.get(reverse("exercise_stats", args=[self.child_profile.pk]), format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_stats_updated_with_submissions(self):
+        for _ in range(3):
+            submit_exercise(self.child_profile, "bbb", fake_analysis("ddd"))
+        submit_exercise(self.child_profile, "bab", fake_analysis("bab"))
+        stats = self.get_stats()
+        # b - 11 appearances, 2 of them correct(0.7 each), a - 1 correct appearance
+        self.assertEqual([(row["letter"], float(row["avg_score"])) for row in stats["letter_scores"]], [("a", 70.0), ("b", 13.0)])
+        self.assertEqual([row["level"] for row in stats["level_scores"]], ["letters"])
+        self.assertEqual(stats["daily_scores"][0]["exercise_count"], 4)
+        self.assertEqual(stats["often_confused_letters"], [
+            {"letter": "b", "confused_with": "d", "times": 9, "confusion_percentage": 82.0}
+        ])
+
+    def test_stats_not_modified(self):
+        submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        self.client.force_authenticate(user=self.adult_user)
+        url = reverse("exercise_stats", args=[self.child_profile.pk])
+        response = self.client.get(url, format="json")
+        self.assertIn("no-cache", response["Cache-Control"])
+        etag = response["ETag"]
+        # only the validator is read - the statistics aren't aggregated again
+        with self.assertNumQueries(1):
+            response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(url, format="json", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # a new submission changes the validator
+        submit_exercise(self.child_profile, "dog", fake_analysis("dog"))
+        response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_stats_cached_until_next_submission(self):
+        submit_exercise(self.child_profile, "cat", fake_analysis("cat"))
+        first_stats = self.get_stats()
+        # the validator and the child(with the ownership check)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_stats(), first_stats)
+        # the cached statistics are dropped when the submission is committed
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            submit_exercise(self.child_profile, "dog", fake_analysis("dog"))
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.get_stats()["daily_scores"][0]["exercise_count"], 2)
+
+    def test_backfill_builds_the_same_stats(self):
+        submit_exercise(self.child_profile, "bbb", fake_analysis("ddd"))
+        submit_exercise(self.child_profile, "cat", fake_analysis("cot"))
+        stats = self.get_stats()
+        call_command("backfill_child_stats", stdout=io.StringIO())
+        self.assertEqual(self.get_stats(), stats)
+
+    def test_stats_of_another_adults_child(self):
+        other_adult = User.objects.create_user(username="adult2", password="test", role=User.Role.ADULT)
+        AdultProfile.objects.create(user=other_adult)
+        self.client.force_authenticate(user=other_adult)
+        response = self.client.get(reverse("exercise_stats", args=[self.child_profile.pk]), format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class HotQueriesPlanTests(BaseTestCase):
+    def test_hot_queries_use_their_indexes(self):
+        # fails(CommandError) if any of the hot queries doesn't use its index on the seeded dataset
+        call_command("explain_hot_queries", stdout=io.StringIO())
+        # the seeded dataset was rolled back
+        self.assertFalse(User.objects.filter(username__startswith="explain_hot_queries").exists())
+
+    def test_missing_index_fails(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX exercise_child_level_idx")
+        errors = io.StringIO()
+        with self.assertRaises(CommandError):
+            call_command("explain_hot_queries", stdout=io.StringIO(), stderr=errors)
+        self.assertIn("exercises of the child in a level doesn't use exercise_child_level_idx", errors.getvalue())
+
 class AdultExerciseReviewTests(BaseTestCase):
     def setUp(self):
         super().setUp() 
@@ -59,8 +642,49 @@ class AdultExerciseReviewTests(BaseTestCase):
         self.client.force_authenticate(user=self.adult_user)
         response = self.client.get(url, format="json")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["id"], self.submitted_exercise.id)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["id"], self.submitted_exercise.id)
+        self.assertIsNone(response.data["next"])
+
+    def test_submissions_list_pages(self):
+        # submitted at the same time - the id decides the order
+        same_time = timezone.now()
+        exercises = [Exercise.objects.create(child=self.child_profile, requested_text="ab", submission_date=same_time)
+                     for _ in range(4)]
+        self.client.force_authenticate(user=self.adult_user)
+        url = reverse("submission_list_of_child", args=[self.child_user.id]) + "?page_size=2"
+        ids = []
+        while url:
+            # the ETag validator, the child(with the ownership check) and the page - the same for any page
+            with self.assertNumQueries(3):
+                response = self.client.get(url, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids += [exercise["id"] for exercise in response.data["results"]]
+            url = response.data["next"]
+        self.assertEqual(ids, [exercise.id for exercise in reversed(exercises)] + [self.submitted_exercise.id])
+
+    def test_submissions_list_filters(self):
+        old_exercise = Exercise.objects.create(child=self.child_profile, requested_text="ab", level="words", category="animal",
+                                               submission_date=timezone.now() - timedelta(days=3))
+        self.client.force_authenticate(user=self.adult_user)
+        url = reverse("submission_list_of_child", args=[self.child_user.id])
+
+        def get_ids(params):
+            response = self.client.get(url, params, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [exercise["id"] for exercise in response.data["results"]]
+
+        self.assertEqual(get_ids({"level": "words"}), [old_exercise.id])
+        self.assertEqual(get_ids({"category": "animal"}), [old_exercise.id])
+        old_day = timezone.localdate(old_exercise.submission_date)
+        self.assertEqual(get_ids({"from_date": old_day, "to_date": old_day}), [old_exercise.id])
+        self.assertEqual(get_ids({"since": (timezone.now() - timedelta(days=1)).isoformat()}), [self.submitted_exercise.id])
+        # the old submission was scored(by the submission worker) after the client last synced
+        last_sync = timezone.now()
+        Exercise.objects.filter(pk=old_exercise.pk).update(scored_date=last_sync + timedelta(seconds=1))
+        self.assertEqual(get_ids({"since": last_sync.isoformat()}), [old_exercise.id])
+        response = self.client.get(url, {"level": "unknown"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_get_exercise(self):
         url = reverse("exercise_retrieve_delete", args=[self.unsubmitted_exercise.id])
@@ -81,3 +705,227 @@ class ArticleTests(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_article_list_not_modified(self):
+        url = reverse("articles_list")
+        self.client.force_authenticate(user=self.adult_user)
+        etag = self.client.get(url, format="json")["ETag"]
+        response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # editing an article changes the validator
+        self.article.title = "Edited Article"
+        self.article.save()
+        response = self.client.get(url, format="json", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_article_list_changed_after_newest_deleted(self):
+        url = reverse("articles_list")
+        self.client.force_authenticate(user=self.adult_user)
+        Article.objects.create(title="Newest Article", description="Test Description", link="http://test.com")
+        response = self.client.get(url, format="json")
+        # only the ETag is a validator - a deleted article can't move the list back to an older version
+        self.assertFalse(response.has_header("Last-Modified"))
+        Article.objects.get(title="Newest Article").delete()
+        response = self.client.get(url, format="json", HTTP_IF_MODIFIED_SINCE=http_date(time.time()))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+
+# the number of queries of each endpoint - a change that adds queries to an endpoint fails here
+@override_settings(STORAGES=IN_MEMORY_STORAGES)
+class EndpointQueryCountTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        caches['default'].clear()
+        caches['analysis'].clear()
+        self.submitted_exercise = Exercise.objects.create(child=self.child_profile, requested_text="ab",
+                                                          submission_date=timezone.now(), score=0.5)
+        SubmittedLetter.objects.create(exercise=self.submitted_exercise, child=self.child_profile,
+                                       expected_letter="a", submitted_letter="a", score=0.5, position=0)
+        self.exercise = Exercise.objects.create(child=self.child_profile, requested_text="ab")
+        self.job = SubmissionJob.objects.create(exercise=self.submitted_exercise)
+        Article.objects.create(title="Test Article", description="Test Description", link="http://test.com")
+
+    def assertEndpointQueries(self, num, user, method, url, **kwargs):
+        self.client.force_authenticate(user=user)
+        with self.assertNumQueries(num):
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 300)
+
+    def test_adult_endpoints(self):
+        # the exercise with its child and its letters
+        self.assertEndpointQueries(2, self.adult_user, "get", reverse("exercise_retrieve_delete", args=[self.submitted_exercise.pk]))
+        # the ETag validator, the child and the statistics(3 of the rollups, the 4th is read with the letters)
+        self.assertEndpointQueries(6, self.adult_user, "get", reverse("exercise_stats", args=[self.child_profile.pk]))
+        # the ETag validator, the child and the page
+        self.assertEndpointQueries(3, self.adult_user, "get", reverse("submission_list_of_child", args=[self.child_profile.pk]))
+        # the ETag validator and the articles
+        self.assertEndpointQueries(2, self.adult_user, "get", reverse("articles_list"))
+
+    def test_child_endpoints(self):
+        # the child and its unsubmitted exercise
+        self.assertEndpointQueries(2, self.child_user, "post", reverse("exercise_generation"))
+        # the job with its exercise and the exercise's letters
+        self.assertEndpointQueries(2, self.child_user, "get", reverse("submission_job_status", args=[self.job.pk]))
+        # the exercise, the transaction's savepoint(2), the exercise update, the job and the letters of the response
+        self.assertEndpointQueries(6, self.child_user, "put", reverse("exercise_submit_async", args=[self.exercise.pk]),
+                                   data={"submitted_image": create_test_image()}, format="multipart")
+
+    @patch("exercises.views.get_models_analysis", return_value=fake_analysis("ab"))
+    def test_submission(self, get_models_analysis):
+        # the exercise, the scoring(as in SubmissionScoringTests) and the letters of the response
+        self.assertEndpointQueries(18, self.child_user, "put", reverse("exercise_submit", args=[self.exercise.pk]),
+                                   data={"submitted_image": create_test_image()}, format="multipart")
+
+    def test_delete(self):
+        # the exercise and the delete(with its letters, its job and its models' analysis)
+        self.assertEndpointQueries(5, self.child_user, "delete", reverse("exercise_retrieve_delete", args=[self.exercise.pk]))
+
+def failing_VLM(VLM_prompt, image_url, timeout):
+    raise ConnectionError("provider is down")
+
+def slow_VLM(VLM_prompt, image_url, timeout):
+    time.sleep(0.5)
+    return "slow answer"
+
+def fast_VLM(VLM_prompt, image_url, timeout):
+    return "fast answer"
+
+@override_settings(VLM_PROVIDER_TIMEOUTS={}, VLM_DEFAULT_TIMEOUT=2, VLM_HEDGE_DELAY=0.05,
+                   VLM_CIRCUIT_BREAKER_FAILURES=2, VLM_CIRCUIT_BREAKER_COOLDOWN=60)
+class VLMProvidersRaceTests(SimpleTestCase):
+    def test_failover_to_next_provider(self):
+        answer, provider_name = race_providers([VLMProvider('down', failing_VLM), VLMProvider('up', fast_VLM)], "prompt", "url")
+        self.assertEqual((answer, provider_name), ("fast answer", "up"))
+
+    def test_hedged_request_for_slow_provider(self):
+        slow_provider = VLMProvider('slow', slow_VLM)
+        answer, provider_name = race_providers([slow_provider, VLMProvider('fast', fast_VLM)], "prompt", "url")
+        # the fast provider was asked after the hedge delay and answered first
+        self.assertEqual((answer, provider_name), ("fast answer", "fast"))
+        self.assertEqual(slow_provider.stats()['requests'], 1)
+
+    def test_circuit_breaker_skips_failing_provider(self):
+        down_provider = VLMProvider('down', failing_VLM)
+        for _ in range(2):
+            self.assertEqual(race_providers([down_provider], "prompt", "url"), (None, None))
+        stats = down_provider.stats()
+        self.assertTrue(stats['circuit_open'])
+        answer, _ = race_providers([down_provider, VLMProvider('up', fast_VLM)], "prompt", "url")
+        self.assertEqual(answer, "fast answer")
+        # the open circuit skipped the request to the failing provider
+        stats = down_provider.stats()
+        self.assertEqual((stats['requests'], stats['failures'], stats['skipped']), (2, 2, 1))
+
+
+# returns the mean pixel of the image so each request can be matched to its result
+class FakePaddleOCR:
+    def ocr(self, img, cls=True):
+        time.sleep(0.01)
+        return [[[None, [('x', 0.5)]]], [np.float32(img.mean())]]
+
+# every model waits for the other models to run a request too - it fails if the requests are run one by one
+class BarrierPaddleOCR(FakePaddleOCR):
+    def __init__(self, barrier):
+        self.barrier = barrier
+
+    def ocr(self, img, cls=True):
+        self.barrier.wait(timeout=5)
+        return super().ocr(img, cls)
+
+class OCRServerTests(SimpleTestCase):
+    def start_server(self, create_ocr, threads):
+        socket_path = os.path.join(tempfile.mkdtemp(), "ocr.sock")
+        worker = OCRWorker(create_ocr, threads)
+        server = OCRServer(socket_path, worker)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return socket_path, worker
+
+    def request_concurrently(self, socket_path, count):
+        results = {}
+        def request(value):
+            results[value] = ocr_via_server(np.full((4, 4), value, dtype=np.uint8), socket_path)
+        threads = [threading.Thread(target=request, args=(value,)) for value in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_requests_share_the_model(self):
+        socket_path, worker = self.start_server(FakePaddleOCR, threads=1)
+        results = self.request_concurrently(socket_path, 4)
+        for value in range(4):
+            self.assertEqual(results[value][0][0][1][0], ['x', 0.5])
+            self.assertEqual(results[value][1], [float(value)])
+        # every request was run by the single model
+        self.assertEqual(worker.done_count, 4)
+        self.assertEqual(worker.max_running, 1)
+        self.assertGreaterEqual(worker.max_waiting, 1)
+
+    def test_models_run_requests_at_the_same_time(self):
+        barrier = threading.Barrier(3)
+        created = []
+        def create_ocr():
+            created.append(BarrierPaddleOCR(barrier))
+            return created[-1]
+        socket_path, worker = self.start_server(create_ocr, threads=3)
+        results = self.request_concurrently(socket_path, 3)
+        # the barrier was passed - the three requests were run at the same time, each by a model of its own
+        self.assertFalse(barrier.broken)
+        self.assertEqual(len(created), 3)
+        self.assertEqual(worker.max_running, 3)
+        for value in range(3):
+            self.assertEqual(results[value][1], [float(value)])
+
+
+@override_settings(OCR_SERVER_SOCKET=None)
+class ModelsLoadingTests(SimpleTestCase):
+    def tearDown(self):
+        ai_models.paddle_ocr = None
+
+    def test_paddle_ocr_loaded_once_on_first_use(self):
+        ai_models.paddle_ocr = None
+        def slow_create_paddle_ocr():
+            time.sleep(0.05)
+            return FakePaddleOCR()
+        with patch("exercises.ai_models.create_paddle_ocr", side_effect=slow_create_paddle_ocr) as create_paddle_ocr:
+            threads = [threading.Thread(target=ai_models.get_paddle_ocr) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertIsInstance(ai_models.get_paddle_ocr(), FakePaddleOCR)
+        self.assertEqual(create_paddle_ocr.call_count, 1)
+
+
+class ImagePreprocessingTests(SimpleTestCase):
+    def create_photo(self, size, orientation=None):
+        img = Image.new("RGB", size, "white")
+        # the writing - a dark rectangle in the middle of the page
+        img.paste((20, 20, 20), (size[0] // 2 - 100, size[1] // 2 - 50, size[0] // 2 + 100, size[1] // 2 + 50))
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", exif=exif)
+        return buffer.getvalue()
+
+    @override_settings(IMAGE_MAX_SIDE=1000, IMAGE_CROP_TO_INK=False)
+    def test_downscaled_grayscale_and_rotated(self):
+        # orientation 6 - the photo has to be rotated by 90 degrees
+        img_np = preprocess_image(self.create_photo((4000, 2000), orientation=6))
+        self.assertEqual(img_np.dtype, np.uint8)
+        self.assertEqual(img_np.shape, (1000, 500))
+
+    @override_settings(IMAGE_MAX_SIDE=1000, IMAGE_CROP_TO_INK=True)
+    def test_cropped_to_ink(self):
+        img_np = preprocess_image(self.create_photo((1000, 1000)))
+        # the 200x100 writing and a margin of 50 pixels around it
+        self.assertAlmostEqual(img_np.shape[0], 200, delta=4)
+        self.assertAlmostEqual(img_np.shape[1], 300, delta=4)
+
+    def test_image_to_data_url(self):
+        data_url = image_to_data_url(np.full((10, 20), 255, dtype=np.uint8))
+        self.assertTrue(data_url.startswith("data:image/jpeg;base64,"))
@@ -0,0 +1,112 @@
+import bisect
+import contextvars
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# where the time of a submission goes - each stage is timed in a span
+# the spans of the current request are collected(collect_spans) for its structured log and its Server-Timing header
+# and every span is added to the stage's histogram in this server worker(timing_stats - shown in MetricsView)
+current_spans = contextvars.ContextVar('current_spans', default=None)
+
+# the upper bounds(in ms) of the histograms' buckets - the last bucket has no upper bound
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, duration_ms):
+        with self.lock:
+            self.counts[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, duration_ms)] += 1
+            self.count += 1
+            self.total_ms += duration_ms
+            self.max_ms = max(self.max_ms, duration_ms)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'count': self.count,
+                'avg_ms': self.total_ms / self.count if self.count else None,
+                'max_ms': self.max_ms,
+                # the count of the spans up to each bound(in ms)
+                'buckets': {str(bound): count for bound, count in zip(HISTOGRAM_BUCKETS_MS + ('inf',), self.counts)},
+            }
+
+
+histograms = {}
+histograms_lock = threading.Lock()
+
+
+def get_histogram(name):
+    with histograms_lock:
+        if name not in histograms:
+            histograms[name] = Histogram()
+        return histograms[name]
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        get_histogram(name).add(duration_ms)
+        spans = current_spans.get()
+        if spans is not None:
+            # list.append is atomic - the spans of the executors' threads are added to the same list
+            spans.append((name, duration_ms))
+
+
+# the result of the function and how long it took(in ms) - for the durations that are kept with the results
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+# the spans of everything that runs inside - including what is submitted to an executor with in_current_context
+@contextmanager
+def collect_spans():
+    spans = []
+    token = current_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        current_spans.reset(token)
+
+
+# the executors' threads don't get the context of the thread that submitted the work
+# executor.submit(in_current_context(function), ...) - the function's spans are added to the current request's spans
+def in_current_context(function):
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(function, *args, **kwargs)
+
+
+def server_timing_header(spans):
+    return ', '.join(f"{name};dur={duration_ms:.1f}" for name, duration_ms in spans)
+
+
+# one json line per submission - its id and the time of each stage
+def log_spans(event, spans, **fields):
+    logger.info(json.dumps({
+        'event': event,
+        **fields,
+        'spans': [{'name': name, 'ms': round(duration_ms, 1)} for name, duration_ms in spans],
+    }))
+
+
+def timing_stats():
+    with histograms_lock:
+        names = sorted(histograms)
+    return {name: get_histogram(name).stats() for name in names}
@@ -0,0 +1,36 @@
+import contextvars
+import logging
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# the detailed trace of the scoring - every character, every model's answer and the PaddleOCR results
+# it is logged at DEBUG level - off by default(the 'exercises.trace' logger's level in settings.LOGGING)
+# a sample of the submissions(settings.SUBMISSION_TRACE_SAMPLE_RATE) logs its full trace at INFO level
+trace_logger = logging.getLogger('exercises.trace')
+trace_sampled = contextvars.ContextVar('trace_sampled', default=False)
+
+
+# the submission that runs inside is traced in full if it was chosen for the sample
+@contextmanager
+def sample_trace():
+    token = trace_sampled.set(random.random() < settings.SUBMISSION_TRACE_SAMPLE_RATE)
+    try:
+        yield
+    finally:
+        trace_sampled.reset(token)
+
+
+def trace_level():
+    return logging.INFO if trace_sampled.get() else logging.DEBUG
+
+
+# to skip building the details of the trace when it won't be logged
+def is_tracing():
+    return trace_logger.isEnabledFor(trace_level())
+
+
+# the message is formatted only if it is logged
+def trace(message, *args):
+    trace_logger.log(trace_level(), message, *args)
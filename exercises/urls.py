@@ -1,11 +1,14 @@
 from django.urls import path
-from .views import ArticlesView, ExerciseStatsView, ExerciseGenerationView, ExerciseSubmissionView, ExerciseRetrieveDeleteView, SubmissionListOfChildView
+from .views import ArticlesView, ExerciseStatsView, ExerciseGenerationView, ExerciseSubmissionView, ExerciseAsyncSubmissionView, SubmissionJobStatusView, ExerciseRetrieveDeleteView, SubmissionListOfChildView, MetricsView
 
 urlpatterns = [
     path('', ExerciseGenerationView.as_view(), name='exercise_generation'),
     path('stats/<int:pk>/', ExerciseStatsView.as_view(), name='exercise_stats'),
     path('<int:pk>/submit/', ExerciseSubmissionView.as_view(), name='exercise_submit'),
+    path('<int:pk>/submit/async/', ExerciseAsyncSubmissionView.as_view(), name='exercise_submit_async'),
+    path('jobs/<int:pk>/', SubmissionJobStatusView.as_view(), name='submission_job_status'),
     path('<int:pk>/', ExerciseRetrieveDeleteView.as_view(), name='exercise_retrieve_delete'),
     path ('<int:pk>/submissions/', SubmissionListOfChildView.as_view(), name='submission_list_of_child'),
-    path ('articles/', ArticlesView.as_view(), name='articles_list')
+    path ('articles/', ArticlesView.as_view(), name='articles_list'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 ]
@@ -1,32 +1,46 @@
 from collections import defaultdict
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
 import random
 import string
-from PIL import Image
-import numpy as np
 import re
 from difflib import SequenceMatcher
 import Levenshtein
 
-from groq import Groq
-from paddleocr import PaddleOCR
-from azure.ai.inference import ChatCompletionsClient
-from azure.core.credentials import AzureKeyCredential
-
 from django.conf import settings
-from django.shortcuts import get_object_or_404
+from django.core.files.base import ContentFile
 from django.utils import timezone
-from django.db.models import Avg, Case, When, F, Value, FloatField, Count, Func
-from django.db.models.functions import TruncDate
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.db import transaction
+from django.db.models import Q
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import IsAdminUser
 
-from accounts.permissions import IsAuthenticatedAdult, IsAuthenticatedChild
-from accounts.models import ChildProfile, AdultProfile
+from accounts.permissions import IsAuthenticatedAdult, IsAuthenticatedChild, GuidedChildMixin
+from accounts.models import ChildProfile
 from .serializers import *
+from .pagination import SubmissionKeysetPagination
+from .vlm_providers import VLMProvider, race_providers
+from .ocr_server import ocr_via_server
+from .ai_models import get_azure_client, get_groq_client, get_paddle_ocr
+from .image_processing import preprocess_image, preprocessing_signature, image_to_data_url
+from .word_index import get_random_word
+from .stats import get_cached_child_stats, invalidate_child_stats, update_child_stats
+from .analysis_cache import analysis_cache_key, get_cached_analysis, set_cached_analysis, analysis_cache_stats
+from .tracing import trace, is_tracing, sample_trace
+from .timing import span, collect_spans, in_current_context, measure, server_timing_header, log_spans, timing_stats
+from .conditional import child_submissions_etag, child_submissions_last_modified, articles_etag
 from .models import *
 
 
+logger = logging.getLogger(__name__)
+
 HANDWRITTEN_CONFUSING_LETTER_PAIRS = [
     ('b', 'd'), ('b', 'p'), ('b', 'q'), ('d', 'g'), ('d', 'q'),
     ('e', 'a'), ('g', 'a'), ('g', 'y'), ('i', 'j'), ('i', 'l'),
@@ -37,6 +51,12 @@ HANDWRITTEN_CONFUSING_LETTER_PAIRS = [
     ('l', 'I'), ('O', 'Q'), ('f', 'F'), ('z', 'Z'), ('q', 'a')
 ]
 
+# the weights of the models in a letter's score - the VLM is more reliable
+VLM_WEIGHT = 0.7
+PADDLEOCR_WEIGHT = 0.3
+# the part of the score a letter gets when it was confused with a visually similar letter
+CONFUSED_LETTER_CREDIT = 0.5
+
 # build a two way map of visually confusing letters
 LETTERS_CONFUSION_MAP = defaultdict(set)
 for a, b in HANDWRITTEN_CONFUSING_LETTER_PAIRS:
@@ -44,43 +64,15 @@ for a, b in HANDWRITTEN_CONFUSING_LETTER_PAIRS:
     LETTERS_CONFUSION_MAP[b].add(a)
 
 
-azure_client = None
-groq_client = None
-paddleOcr = None
-
-def initialize_models():
-    # if any of the models is not initialized - try to initialize them
-    global groq_client, paddleOcr, azure_client
-    if azure_client == None:
-        try:
-            azure_client = ChatCompletionsClient(
-                endpoint='https://models.github.ai/inference',
-                credential=AzureKeyCredential(settings.AZURE_TOKEN)
-            )
-        except Exception as e:
-            print("Failed to initialize the Azure client")
-            print(e)
-
-    if groq_client == None:
-        try:
-            groq_client = Groq(api_key=settings.GROQ_API_KEY)
-        except Exception as e:
-            print("Failed to initialize the Groq client")
-            print(e)
-
-    if paddleOcr == None:
-        try:
-            paddleOcr = PaddleOCR(use_angle_cls=True, lang='en', show_log=False)
-        except Exception as e:
-            print("Failed to initialize the PaddleOCR client")
-            print(e)
-
-# get the models analysis for the exercise
-def get_models_analysis(exercise):
-    # if any of the models is not initialized - try to initialize them again
-    if groq_client == None or paddleOcr == None or azure_client == None:
-        initialize_models()
-    VLM_answer = None
+# PaddleOCR runs on its own thread so it can work while waiting for the VLM's answer
+# a single thread - the same PaddleOCR model shouldn't be used by two threads at once
+paddleocr_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='paddleocr')
+
+# change it whenever the prompts change - the cached analysis of the old prompts won't be used
+VLM_PROMPT_VERSION = 1
+
+def get_VLM_prompt(exercise):
+    VLM_prompt = None
     if exercise.level == ChildProfile.ExerciseLevel.CATEGORY:
        VLM_prompt = f"""
                     A child submitted this image. Please follow the instructions exactly. 
@@ -137,14 +129,14 @@ def get_models_analysis(exercise):
                     - Line quality
                     - Any other relevant features
                     """
-    # if azure was initialized - use it as our first choice for a VLM model
-    if azure_client:
-        try:
-            VLM_answer = azure_client.complete(
-                messages=[
-                {
-                    "role": "user",
-                    "content": [
+    return VLM_prompt
+
+def ask_azure_VLM(VLM_prompt, image_url, timeout):
+    return get_azure_client().complete(
+        messages=[
+            {
+                "role": "user",
+                "content": [
                     {
                         "type": "text",
                         "text": VLM_prompt
@@ -152,93 +144,167 @@ def get_models_analysis(exercise):
                     {
                         "type": "image_url",
                         "image_url": {
-                        "url": exercise.submitted_image.url
+                            "url": image_url
                         }
                     }
-                    ],
-                },
-            ],
-                temperature=0.5,
-                top_p=1.0,
-                max_tokens=150,
-                model="openai/gpt-4.1-mini"
-            )
-            print("Azure answered successfully")
-        except Exception as e:
-            print("Failed to recognize the text using the Azure model")
-            print(e)
-    
-    if groq_client and VLM_answer == None:
-        try:
-            VLM_answer = groq_client.chat.completions.create(
-                model="meta-llama/llama-4-scout-17b-16e-instruct",
-                messages=[
+                ],
+            },
+        ],
+        temperature=0.5,
+        top_p=1.0,
+        max_tokens=150,
+        model="openai/gpt-4.1-mini",
+        # the deadline of the provider - the request fails instead of holding the submission
+        read_timeout=timeout
+    )
+
+def ask_groq_VLM(VLM_prompt, image_url, timeout):
+    return get_groq_client().chat.completions.create(
+        model="meta-llama/llama-4-scout-17b-16e-instruct",
+        messages=[
+            {
+                "role": "user",
+                "content": [
                     {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": VLM_prompt
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": exercise.submitted_image.url
-                                }
-                            }
-                        ]
+                        "type": "text",
+                        "text": VLM_prompt
+                    },
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image_url
+                        }
                     }
-                ],
-                temperature=0.5,
-                max_tokens=150,
-                n=1,
-                stop=None
-            )
-            print("groq answered successfully")
-        except Exception as e:
-            print("Failed to recognize the text using the groq's VLM model")
-            print(e)
+                ]
+            }
+        ],
+        temperature=0.5,
+        max_tokens=150,
+        n=1,
+        stop=None,
+        timeout=timeout
+    )
+
+# azure is our first choice for a VLM model, groq is asked if it fails or is too slow
+azure_VLM_provider = VLMProvider('azure', ask_azure_VLM)
+groq_VLM_provider = VLMProvider('groq', ask_groq_VLM)
+
+# ask the VLM models what is written in the image
+# returns the answer and the name of the provider that gave it - (None, None) if none of them answered
+def get_VLM_answer(VLM_prompt, image_url):
+    providers = []
+    if get_azure_client():
+        providers.append(azure_VLM_provider)
+    if get_groq_client():
+        providers.append(groq_VLM_provider)
+    return race_providers(providers, VLM_prompt, image_url)
+
+# img_np - the preprocessed(scaled down and grayscale) image
+# returns PaddleOCR's results and whether it failed - [None] is also its result when it didn't detect any text
+def get_paddleocr_results(img_np):
+    try:
+        with span('ocr'):
+            if settings.OCR_SERVER_SOCKET:
+                results = ocr_via_server(img_np)
+            else:
+                results = get_paddle_ocr().ocr(img_np, cls=True)
+    except Exception:
+        logger.warning("Failed to recognize the text using the PaddleOCR model", exc_info=True)
+        return [None], True
+    trace("PaddleOCR results: %s", results)
+    return results, False
+
+# split the answer by numberings(like 1. 2. 3.)
+def split_VLM_answer(VLM_answer):
+    VLM_answer_parts = re.split(r'\d+\.\s+', VLM_answer.choices[0].message.content.strip())[1:]
+    return [re.sub(r'\s+', ' ', part).strip() for part in VLM_answer_parts]
+
+# the category exercise's answer says that the word isn't from that category - no need to use PaddleOCR
+def is_outside_category(exercise, VLM_answer_parts):
+    return (exercise.level == ChildProfile.ExerciseLevel.CATEGORY and len(VLM_answer_parts) > 1
+            and VLM_answer_parts[1].lower() == "no")
 
+# update the exercise according to the VLM's answer and return the VLM's guess of the text
+def apply_VLM_answer_parts(exercise, VLM_answer_parts):
     VLM_guess = None
+    # Thought about giving half the score if the word is close to the requested category
+    # and half for the distance between the guessed word and that word from the category
+    for i in range(len(VLM_answer_parts)):
+        trace("VLM answer part %d: %s", i, VLM_answer_parts[i])
+    if len(VLM_answer_parts) > 0:
+        VLM_guess = VLM_answer_parts[0]
+        # the feedback is the last part of the answer
+        exercise.feedback = VLM_answer_parts[-1].strip()
+        if exercise.level == ChildProfile.ExerciseLevel.CATEGORY:
+            # if the second part is "yes" - it means that the word is from that category
+            if len(VLM_answer_parts) > 1 and VLM_answer_parts[1].lower() == "yes":
+                # if it is close to a word from the category - will we want to see how close it is
+                exercise.requested_text = VLM_answer_parts[2].strip().split(" ")[0]
+            elif is_outside_category(exercise, VLM_answer_parts):
+                # if the second part is "no" - it means that the word is not from that category
+                exercise.submitted_text = VLM_guess
+    return VLM_guess
+
+def get_analysis_version():
+    return f"{VLM_PROMPT_VERSION}-{preprocessing_signature()}"
+
+# get the models analysis for the exercise - a ModelsAnalysis that isn't saved yet(it is saved with the scored exercise)
+# the same image(in the same level, category and prompt) is analyzed only once - the models' answers are cached
+# the VLM request and PaddleOCR run at the same time - so it takes about as long as the slower of them
+def get_models_analysis(exercise, image_bytes=None):
+    # the image is analyzed straight from the uploaded bytes, without waiting for the storage
+    # if they aren't given(the submission worker) - the image is read from the storage
+    if image_bytes is None:
+        submitted_image = exercise.submitted_image
+        image_bytes = submitted_image.read()
+        submitted_image.seek(0)
+    cache_key = analysis_cache_key(image_bytes, exercise.level, exercise.category, get_analysis_version())
+    cached_analysis = get_cached_analysis(cache_key)
+    if cached_analysis is not None:
+        analysis = ModelsAnalysis(exercise=exercise, analysis_version=get_analysis_version(), cached=True, **cached_analysis)
+        apply_VLM_answer_parts(exercise, analysis.vlm_answer_parts)
+        return analysis
+
+    # the image is decoded once for both of the models
+    with span('image_decode'):
+        img_np = preprocess_image(image_bytes)
+    ocr_future = None
+    # the models are loaded on their first use(if a model failed to load - it will be tried again)
+    OCR_failed = True
+    if settings.OCR_SERVER_SOCKET or get_paddle_ocr() != None:
+        ocr_future = paddleocr_executor.submit(in_current_context(measure), get_paddleocr_results, img_np)
+    # the VLM gets the image inside the request - so it doesn't have to download it from the storage
+    with span('image_encode'):
+        image_url = image_to_data_url(img_np)
+    (VLM_answer, VLM_provider), VLM_latency_ms = measure(get_VLM_answer, get_VLM_prompt(exercise), image_url)
+
+    VLM_answer_parts = []
     # if any of the models was able to guess the text
     if VLM_answer:
-        # split the answer by numberings(like 1. 2. 3.)
-        # Thought about giving half the score if the word is close to the requested category
-        # and half for the distance between the guessed word and that word from the category
-        VLM_answer_parts = re.split(r'\d+\.\s+', VLM_answer.choices[0].message.content.strip())[1:]
-        VLM_answer_parts = [re.sub(r'\s+', ' ', part).strip() for part in VLM_answer_parts]
-        for i in range(len(VLM_answer_parts)):
-            print(f"VLM answer part {i}: {VLM_answer_parts[i]}")
-        if len(VLM_answer_parts) > 0:
-            VLM_guess = VLM_answer_parts[0]
-            # the feedback is the last part of the answer
-            exercise.feedback = VLM_answer_parts[-1].strip()
-            if exercise.level == ChildProfile.ExerciseLevel.CATEGORY:
-                # if the second part is "yes" - it means that the word is from that category
-                if len(VLM_answer_parts) > 1 and VLM_answer_parts[1].lower() == "yes":
-                    # if it is close to a word from the category - will we want to see how close it is
-                    exercise.requested_text = VLM_answer_parts[2].strip().split(" ")[0]
-                elif len(VLM_answer_parts) > 1 and VLM_answer_parts[1].lower() == "no":
-                    # if the second part is "no" - it means that the word is not from that category
-                    exercise.submitted_text = VLM_guess
+        VLM_answer_parts = split_VLM_answer(VLM_answer)
     results = [None]
-    # if the exercise is a category exercise, but the VLM didn't think it is a word from that category - no need to use PaddleOCR
-    if exercise.submitted_text == "":
-        # since the image is sent as a file, we need to open it and convert it to a numpy array
-        # then we can use PaddleOCR to extract the text from the image
-        submitted_image = exercise.submitted_image
-        img = Image.open(submitted_image)
-        img_np = np.array(img)
-        # Image.open causes the file pointer to be at the end of the file so we need to get it back to the beginning
-        submitted_image.seek(0)
-        if paddleOcr != None:
-            try:
-                results = paddleOcr.ocr(img_np, cls=True)
-            except Exception as e:
-                print("Failed to recognize the text using the PaddleOCR model")
-                print(e)
-            print("PaddleOCR results: ", results)
-    return VLM_guess, results
+    OCR_latency_ms = None
+    if ocr_future != None:
+        # if the exercise is a category exercise, but the VLM didn't think it is a word from that category - PaddleOCR's result isn't needed
+        if not is_outside_category(exercise, VLM_answer_parts):
+            (results, OCR_failed), OCR_latency_ms = ocr_future.result()
+        else:
+            # if PaddleOCR didn't start yet it won't run at all, otherwise its result is ignored
+            ocr_future.cancel()
+            OCR_failed = False
+    paddleocr_text, paddleocr_scores = get_paddleocr_text_and_scores(results)
+    analysis = ModelsAnalysis(
+        exercise=exercise, vlm_provider=VLM_provider, vlm_answer_parts=VLM_answer_parts,
+        # None - PaddleOCR didn't recognize anything(or didn't run)
+        ocr_text=paddleocr_text if results[0] is not None else None,
+        analysis_version=get_analysis_version(), vlm_latency_ms=VLM_latency_ms, ocr_latency_ms=OCR_latency_ms
+    )
+    analysis.set_ocr_scores(paddleocr_scores)
+    # don't cache a failed VLM request or a failed PaddleOCR(or a model that didn't load) - the next submission of the image should try again
+    if VLM_answer_parts and not OCR_failed:
+        set_cached_analysis(cache_key, analysis)
+    apply_VLM_answer_parts(exercise, VLM_answer_parts)
+    return analysis
 
 
 def compare_expected_with_recognized(expected, recognized, scores):
@@ -260,19 +326,25 @@ def compare_expected_with_recognized(expected, recognized, scores):
     
     return results
 
-def score_exercise(exercise, VLM_guess, paddleocr_analysis):
-    print('\nDetected characters and their confidence score: ')
-    expected_text = exercise.requested_text
-    VLM_guess = VLM_guess if VLM_guess else ''
-    VLM_comparison = compare_expected_with_recognized(exercise.requested_text, VLM_guess, [1.0] * len(VLM_guess))
+# the recognized characters and the confidence score of each of them
+def get_paddleocr_text_and_scores(paddleocr_analysis):
     paddleocr_text = ''.join([paddleocr_analysis[0][0][1][i][0] for i in range(len(paddleocr_analysis[0][0][1]))] if paddleocr_analysis[0] else [])
     paddleocr_scores = [paddleocr_analysis[1][i] for i in range(len(paddleocr_analysis[1]))] if paddleocr_analysis and len(paddleocr_analysis) > 1  else []
-    print(f"VLM guess: {VLM_guess}, PaddleOCR text: {paddleocr_text}, PaddleOCR scores: {paddleocr_scores}")
-    paddleocr_comparison = compare_expected_with_recognized(exercise.requested_text, paddleocr_text, paddleocr_scores)
-    print(f"PaddleOCR comparison: {paddleocr_comparison}")
-    print(f"VLM comparison: {VLM_comparison}")
-    # evaluation for debugging
-    evaluation = []
+    return paddleocr_text, paddleocr_scores
+
+# the scoring of the text the models recognized - depends only on its arguments(no models and no database)
+# so it can be replayed on the saved analyses(ModelsAnalysis)
+# returns (the letters - (expected, submitted, score, VLM's letter, VLM's score, PaddleOCR's letter, PaddleOCR's score),
+#          the text similarity, the score)
+def score_recognized_text(expected_text, VLM_guess, paddleocr_text, paddleocr_scores):
+    VLM_guess = VLM_guess if VLM_guess else ''
+    paddleocr_text = paddleocr_text if paddleocr_text else ''
+    VLM_comparison = compare_expected_with_recognized(expected_text, VLM_guess, [1.0] * len(VLM_guess))
+    trace("VLM guess: %s, PaddleOCR text: %s, PaddleOCR scores: %s", VLM_guess, paddleocr_text, paddleocr_scores)
+    paddleocr_comparison = compare_expected_with_recognized(expected_text, paddleocr_text, paddleocr_scores)
+    trace("PaddleOCR comparison: %s", paddleocr_comparison)
+    trace("VLM comparison: %s", VLM_comparison)
+    letters = []
     avg_correctly_guessed_score = 0.0
     for i in range(len(expected_text)):
         VLM_char = VLM_comparison[i][1]
@@ -282,51 +354,132 @@ def score_exercise(exercise, VLM_guess, paddleocr_analysis):
         current_char_score = 0.0
         submitted_char = ''
         expected_char = expected_text[i]
+        # the same rules are applied to many exercises at once in batch_scoring.py
         if VLM_char == paddleocr_char and VLM_char != '':
             submitted_char = VLM_char
-            current_char_score = VLM_score * 0.7 + paddleocr_score * 0.3
+            current_char_score = VLM_score * VLM_WEIGHT + paddleocr_score * PADDLEOCR_WEIGHT
         # the models recognized different chars - if one is correct, use it and take into account that only one model is correct
         elif VLM_char == expected_char:
             submitted_char = VLM_char
-            current_char_score = (1 - paddleocr_score * 0.3) if paddleocr_score != 0 else 0.7
+            current_char_score = (1 - paddleocr_score * PADDLEOCR_WEIGHT) if paddleocr_score != 0 else VLM_WEIGHT
         elif paddleocr_char == expected_char:
             submitted_char = paddleocr_char
-            current_char_score = paddleocr_score * 0.3
+            current_char_score = paddleocr_score * PADDLEOCR_WEIGHT
         # no model recognized the expected char - use VLM if it is not empty, otherwise use PaddleOCR
         elif VLM_char != '':
             submitted_char = VLM_char
-            current_char_score = (1 - paddleocr_score * 0.3) if paddleocr_score != 0 else 0.7
+            current_char_score = (1 - paddleocr_score * PADDLEOCR_WEIGHT) if paddleocr_score != 0 else VLM_WEIGHT
         elif paddleocr_char != '':
             submitted_char = paddleocr_char
-            current_char_score = paddleocr_score * 0.3
+            current_char_score = paddleocr_score * PADDLEOCR_WEIGHT
         
         # the correct character was detected by one of the models - add its confidence to the score
         if submitted_char == expected_char:
             avg_correctly_guessed_score += current_char_score
         elif submitted_char in LETTERS_CONFUSION_MAP.get(expected_char, set()):
             # if the submitted char is often confused with the expected char - make it contribute to the score
-            avg_correctly_guessed_score += (0.5 * current_char_score)
-        
-        evaluation.append((expected_char, submitted_char, current_char_score))
+            avg_correctly_guessed_score += (CONFUSED_LETTER_CREDIT * current_char_score)
 
-        exercise.submitted_text += submitted_char
-        # save the letter score in the db
-        SubmittedLetter.objects.create(
-            exercise=exercise,
-            submitted_letter=submitted_char,
-            expected_letter=expected_char,
-            score=current_char_score,
-            position=i
-        )
-        print(f"Expected: {expected_char}, Detected: {submitted_char}, with Confidence: {current_char_score}")
+        letters.append((expected_char, submitted_char, current_char_score, VLM_char, VLM_score, paddleocr_char, paddleocr_score))
+    # evaluation for debugging - only collected when it is logged
+    if is_tracing():
+        trace("Evaluation of the exercise(expected, detected, confidence): %s", [letter[:3] for letter in letters])
     # average the score
-    print("Evaluation of the exercise: ", evaluation)
     avg_correctly_guessed_score /= len(expected_text) if len(expected_text) > 0 else 1.0
     VLM_levenshtein_ratio = Levenshtein.ratio(expected_text, VLM_guess) if VLM_guess else 0.0
     paddleocr_levenshtein_ratio = Levenshtein.ratio(expected_text, paddleocr_text) if paddleocr_text else 0.0
     levenshtein_ratio = max(VLM_levenshtein_ratio, paddleocr_levenshtein_ratio)
-    exercise.score = (avg_correctly_guessed_score + levenshtein_ratio) / 2
-    print("submitted: " + exercise.submitted_text + " Average score:", avg_correctly_guessed_score, "Levenshtein ratio:", levenshtein_ratio, "Final score:", exercise.score)
+    score = (avg_correctly_guessed_score + levenshtein_ratio) / 2
+    trace("Average score: %s Levenshtein ratio: %s Final score: %s", avg_correctly_guessed_score, levenshtein_ratio, score)
+    return letters, levenshtein_ratio, score
+
+# scores the exercise from the models' analysis and returns its letters - they are not saved yet
+def score_exercise(exercise, analysis):
+    letters, exercise.text_similarity, exercise.score = score_recognized_text(
+        exercise.requested_text, analysis.VLM_guess, analysis.ocr_text, analysis.get_ocr_scores()
+    )
+    submitted_letters = []
+    for position, (expected_char, submitted_char, score, VLM_char, VLM_score, paddleocr_char, paddleocr_score) in enumerate(letters):
+        exercise.submitted_text += submitted_char
+        # the letters are saved all at once with the exercise
+        submitted_letters.append(SubmittedLetter(
+            exercise=exercise,
+            child_id=exercise.child_id,
+            submitted_letter=submitted_char,
+            expected_letter=expected_char,
+            score=score,
+            position=position,
+            # what each model recognized in this position - to score the letter again without the models
+            vlm_letter=VLM_char,
+            vlm_score=VLM_score,
+            ocr_letter=paddleocr_char,
+            ocr_score=paddleocr_score
+        ))
+    trace("submitted: %s", exercise.submitted_text)
+    return submitted_letters
+
+# check if the child should move to another level according to the last exercises in the current level
+# called in the transaction that saves the scored exercise - the child is locked so two submissions don't override its window
+def update_child_level(exercise):
+    current_child = ChildProfile.objects.select_for_update().get(pk=exercise.child_id)
+    # the exercise was generated before the child moved to another level
+    if exercise.level != current_child.exercise_level:
+        return
+    previous_level = current_child.exercise_level
+    if current_child.add_recent_score(exercise.score):
+        logger.info("Child %s has moved from level %s to level %s", current_child.pk, previous_level, current_child.exercise_level)
+    else:
+        logger.debug("Child %s has done %d exercises recently in the level %s", current_child.pk, len(current_child.recent_scores), previous_level)
+    current_child.save(update_fields=['exercise_level', 'recent_scores', 'recent_score_index', 'recent_score_sum'])
+    exercise.child = current_child
+
+# uploading the images to the storage(cloudinary) runs on these threads
+storage_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='storage')
+
+# returns the name the storage gave the image
+def store_submitted_image(exercise, file_name, image_bytes):
+    image_field = exercise.submitted_image.field
+    name = image_field.generate_filename(exercise, file_name)
+    with span('storage_save'):
+        return image_field.storage.save(name, ContentFile(image_bytes), max_length=image_field.max_length)
+
+# runs the models on the submitted image of the exercise, scores it and updates the child's level
+# used both by the submission view and by the submission worker
+# image_bytes - the uploaded image(None - read it from the storage)
+# stored_image_future - the upload of the image to the storage that runs while the models analyze it
+def evaluate_submission(exercise, submission_date, image_bytes=None, stored_image_future=None):
+    exercise.submitted_text = ""
+    exercise.score = 0.0
+    # the letters are saved with the day of the submission
+    exercise.submission_date = submission_date
+    analysis = get_models_analysis(exercise, image_bytes)
+    analysis.exercise = exercise
+
+    submitted_letters = []
+    # if any of the models was able to guess the text
+    if analysis.ocr_text is not None or analysis.VLM_guess is not None:
+        with span('scoring'):
+            submitted_letters = score_exercise(exercise, analysis)
+
+    exercise.scored_date = timezone.now()
+
+    if stored_image_future is not None:
+        # the name the storage gave the image
+        # the upload started with the analysis - this is only the time it was still running after it
+        with span('storage_wait'):
+            exercise.submitted_image = stored_image_future.result()
+    # the same number of queries for any length of the exercise
+    with transaction.atomic():
+        with span('db_writes'):
+            exercise.save()
+            # kept with the scored exercise - it can be scored again from it without the models
+            analysis.save(force_insert=True)
+            SubmittedLetter.objects.bulk_create(submitted_letters)
+            update_child_stats(exercise, submitted_letters)
+        with span('level_progression'):
+            update_child_level(exercise)
+        # after the commit - also of an outer transaction(the submission worker's job), so no request caches the statistics before it
+        transaction.on_commit(lambda: invalidate_child_stats(exercise.child_id))
 
 class ExerciseSubmissionView(generics.GenericAPIView):
     # queryset will tell get_object which model to look for
@@ -338,7 +491,8 @@ class ExerciseSubmissionView(generics.GenericAPIView):
         # get the exercise object by its id(provided in the url - its pk - primary key)
         exercise = self.get_object()
         # check if the exercise belongs to the current child if not return 403 forbidden
-        if exercise.child.user != request.user:
+        # (the child's profile has the same pk as its user - so the child isn't read)
+        if exercise.child_id != request.user.id:
             return Response(status=status.HTTP_403_FORBIDDEN)
         # check if the exercise is already submitted - if so return 403 forbidden
         if exercise.submission_date is not None:
@@ -347,40 +501,55 @@ class ExerciseSubmissionView(generics.GenericAPIView):
         serializer.is_valid(raise_exception=True) 
         save_submission_date = timezone.now()
         submitted_image = serializer.validated_data["submitted_image"]
-        exercise.submitted_image = submitted_image
-        exercise.save()
-        exercise.submitted_text = ""
-        exercise.score = 0.0
-        VLM_guess, results = get_models_analysis(exercise)
-
-        # if any of the models was able to guess the text
-        if results[0] != None or VLM_guess != None:
-            score_exercise(exercise, VLM_guess, results)
-        
-        exercise.submission_date = save_submission_date
-        exercise.save()
+        submitted_image.seek(0)
+        image_bytes = submitted_image.read()
+        with collect_spans() as spans, sample_trace():
+            # the image is uploaded to the storage while the models analyze it
+            stored_image_future = storage_executor.submit(in_current_context(store_submitted_image), exercise, submitted_image.name, image_bytes)
+            evaluate_submission(exercise, save_submission_date, image_bytes, stored_image_future)
+        log_spans('submission', spans, exercise=exercise.pk)
         serializer = ExerciseSubmitSerializer(exercise)
-        
-        current_child = exercise.child
-        # get the last 10 exercises of the child
-        recent_exercises = (Exercise.objects.filter(child=current_child).order_by('-submission_date')[:10])
-        # make sure that the last 10 exercises were in the current level
-        recent_current_level_exercises = [ex for ex in recent_exercises if ex.level == current_child.exercise_level]
-        print(f"Child {current_child.user.username} has done {len(recent_current_level_exercises)} exercises recently in his current level {current_child.exercise_level}")
-        if len(recent_current_level_exercises) == 10:
-            # if there are 10 exercises in the current level - calculate their avg score
-            avg_score = sum(float(ex.score) for ex in recent_current_level_exercises) / 10.0
-            print(f"Avg score for child {current_child.user.username} in level {current_child.exercise_level} (the last 10 ex): {float(avg_score):.4f}")
-            # if the avg score is above 0.7 - move the child to the next level
-            if avg_score >= 0.7:
-                print(f"Child {current_child.user.username} has reached the next level")
-                current_child.exercise_level = ChildProfile.get_next_level(current_child.exercise_level)
-                current_child.save()
-            elif avg_score <= 0.3:
-                print(f"Child {current_child.user.username} has been lowered to the previous level")
-                current_child.exercise_level = ChildProfile.get_previous_level(current_child.exercise_level)
-                current_child.save()
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # the time of each stage - shown in the browser's dev tools
+        return Response(serializer.data, status=status.HTTP_200_OK, headers={'Server-Timing': server_timing_header(spans)})
+
+# the asynchronous submission mode - only saves the image and queues a scoring job
+# the job is done by the submission worker and its status can be polled in SubmissionJobStatusView
+class ExerciseAsyncSubmissionView(generics.GenericAPIView):
+    queryset = Exercise.objects.all()
+    serializer_class = ExerciseSubmitSerializer
+    permission_classes = (IsAuthenticatedChild, )
+
+    def put(self, request, pk):
+        exercise = self.get_object()
+        # check if the exercise belongs to the current child if not return 403 forbidden
+        if exercise.child_id != request.user.id:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        # check if the exercise is already submitted - if so return 403 forbidden
+        if exercise.submission_date is not None:
+            return Response(status=status.HTTP_403_FORBIDDEN)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        exercise.submitted_image = serializer.validated_data["submitted_image"]
+        # the exercise counts as submitted from now on(so a new exercise can be generated)
+        # its score stays empty until the worker scores it
+        exercise.submission_date = timezone.now()
+        exercise.score = None
+        with transaction.atomic():
+            exercise.save()
+            job = SubmissionJob.objects.create(exercise=exercise)
+        return Response(SubmissionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+class SubmissionJobStatusView(generics.RetrieveAPIView):
+    queryset = SubmissionJob.objects.select_related('exercise').prefetch_related(prefetch_letters('exercise__submittedletter_set'))
+    serializer_class = SubmissionJobSerializer
+    permission_classes = (IsAuthenticatedChild, )
+
+    def get_object(self):
+        job = super().get_object()
+        # check if the job is of an exercise of the current child if not return 403 forbidden
+        if job.exercise.child_id != self.request.user.id:
+            raise PermissionDenied("You are not allowed to view this submission.")
+        return job
 
 class ExerciseGenerationView(generics.GenericAPIView):
     serializer_class = ExerciseGenerationSerializer
@@ -402,9 +571,7 @@ class ExerciseGenerationView(generics.GenericAPIView):
                 category = random.choice([choice[0] for choice in Exercise.ExerciseCategory.choices])
                 # choose a random word from the chosen category from the categorized words
                 if current_child_level == ChildProfile.ExerciseLevel.WORDS:
-                    requested_text = random.choice(
-                        CategorizedWord.objects.filter(category=category).values_list('word', flat=True)
-                    )
+                    requested_text = get_random_word(category)
 
             exercise = Exercise.objects.create(child=current_child, requested_text=requested_text, level=current_child_level, category=category)
             response_status = status.HTTP_201_CREATED
@@ -414,98 +581,33 @@ class ExerciseGenerationView(generics.GenericAPIView):
         return Response(serializer.data, status=response_status)
 
 
-class ExerciseStatsView(generics.GenericAPIView):
+# the browsers should check with the server before using their copy(it is answered with 304 when nothing changed)
+revalidate = cache_control(private=True, no_cache=True)
+child_submissions_condition = condition(etag_func=child_submissions_etag, last_modified_func=child_submissions_last_modified)
+
+@method_decorator([revalidate, child_submissions_condition], name='get')
+class ExerciseStatsView(GuidedChildMixin, generics.GenericAPIView):
     permission_classes = [IsAuthenticatedAdult, ]
     serializer_class = ExerciseStatsSerializer
     def get(self, request, pk):
-        # in order to round the avg scores to 2 decimal places
-        class Round2(Func):
-            function = 'ROUND'
-            template = '%(function)s(%(expressions)s, 2)'
-        
-        child = get_object_or_404(ChildProfile, pk=pk)
-        # check if the child belongs to the current adult if not return 403 forbidden
-        current_adult = AdultProfile.objects.get(user=request.user)
-        if child.guiding_adult != current_adult:
-            return Response(status=status.HTTP_403_FORBIDDEN)
-        # the avg score of the child in each letter
-        # values - group by the letter
-        # the first annotate - if the letter was guessed correctly - add its score to the avg score else 0
-        letter_scores = (SubmittedLetter.objects.filter(exercise__child=child).annotate(
-                guessing_score=Case(
-                    When(expected_letter=F('submitted_letter'), then=F('score')),
-                    default=Value(0.0),
-                    output_field=FloatField()
-                )
-            ).values('expected_letter').annotate(letter=F('expected_letter'), avg_score=100 * Round2(Avg('guessing_score'))
-            ).values('letter', 'avg_score').order_by('letter'))
-        
-        # the avg score of the child in each level
-        level_scores = (
-            Exercise.objects.filter(child=child)
-            .values('level')
-            .annotate(avg_score=100* Round2(Avg('score')))
-        )
-        level_order = ['letters', 'words', 'category']
-        # sort the scores by the level order
-        level_scores = sorted(level_scores, key=lambda x: level_order.index(x['level']))
-        # the avg score of the child in each day
-        daily_scores = (
-                Exercise.objects.filter(child=child, submission_date__isnull=False)
-                .annotate(day=TruncDate('submission_date'))
-                .values('day')
-                .annotate(avg_score=100* Round2(Avg('score')), exercise_count=Count('id'))
-                .order_by('day')
-        )
-
-        # letters confused with other letters
-        confused_letters = (
-            SubmittedLetter.objects.filter(exercise__child=child)
-            .exclude(expected_letter=F('submitted_letter')) # don't include correct guesses
-            .exclude(submitted_letter='') # don't include empty guesses
-            .values('expected_letter', 'submitted_letter')
-            .annotate(confusion_count=Count('id')) # count how many times the expected letter was confused with the submitted letter
-            .order_by('expected_letter', '-confusion_count')
-        )
-
-        letter_appearances = dict(
-            SubmittedLetter.objects.filter(exercise__child=child)
-            .values('expected_letter')
-            .annotate(total=Count('id'))
-            .values_list('expected_letter', 'total')
-        )
-        often_confused_letters = []
-        already_added_letters = set()
-        for confusion in confused_letters:
-            expected_letter = confusion['expected_letter']
-            # will want to add only the most confused letter with each letter
-            # it is the first in order in confused_letters because it is sorted by the confusion_count
-            # goes over the other letters confused with the same one
-            if expected_letter not in already_added_letters:
-                confused_with = confusion['submitted_letter']
-                confusion_count = confusion['confusion_count']
-                letter_total_appearances = letter_appearances.get(expected_letter, 1)
-                confusion_percentage = round((confusion_count / letter_total_appearances) * 100, 0)
-                # if it is confused often - add the submitted letter and the confusion count to the list of confused letters
-                if confusion_percentage >= 65 and confusion_count >= 3: 
-                    often_confused_letters.append({
-                        'letter': expected_letter,
-                        'confused_with': confused_with,
-                        'times': confusion_count,
-                        'confusion_percentage': confusion_percentage
-                    })
-
-        return Response({
-            'letter_scores': letter_scores,
-            'level_scores': level_scores,
-            'daily_scores': daily_scores,
-            'often_confused_letters': often_confused_letters
-        }, status=status.HTTP_200_OK)
+        # 403 forbidden if the child doesn't belong to the current adult
+        child = self.get_guided_child()
+        # the statistics are kept up to date with every submission and cached until the next one(stats.py)
+        stats = get_cached_child_stats(child.pk, child_submissions_etag(request, child.pk))
+        return Response(stats, status=status.HTTP_200_OK)
     
 # both retrieve and delete methods are implemented in the same view - so they could be in the same path
 class ExerciseRetrieveDeleteView(generics.RetrieveDestroyAPIView):
     serializer_class = ExerciseSerializer
     queryset = Exercise.objects.all()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # the letter scores are shown only when retrieving the exercise
+        # and the child is needed for checking its adult
+        if self.request.method == 'GET':
+            queryset = queryset.select_related('child').prefetch_related(prefetch_letters())
+        return queryset
     
     def get_permissions(self):
         # if the request is a delete request - only authenticated children can access it
@@ -520,34 +622,94 @@ class ExerciseRetrieveDeleteView(generics.RetrieveDestroyAPIView):
         exercise = super().get_object()
         if self.request.method == 'DELETE':
             # check if the exercise belongs to the current child if not return 403 forbidden
-            if exercise.child.user != self.request.user or exercise.submission_date is not None:
+            if exercise.child_id != self.request.user.id or exercise.submission_date is not None:
                 raise PermissionDenied("You are not allowed to delete this exercise.")
         elif self.request.method == 'GET':
             # check if the exercise belongs to a child of the current adult if not return 403 forbidden
-            current_adult = AdultProfile.objects.get(user=self.request.user)
-            if exercise.child.guiding_adult != current_adult:
+            if exercise.child.guiding_adult_id != self.request.user.id:
                 raise PermissionDenied("You are not allowed to retrieve this exercise.")
         return exercise
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        transaction.on_commit(lambda: invalidate_child_stats(instance.child_id))
     
-class SubmissionListOfChildView(generics.ListAPIView):
+# the submissions of the child from the newest one - in pages(pagination.py)
+# optional filters - level, category, from_date and to_date(the days of the submissions, inclusive)
+# and since - only the submissions that were submitted or scored after this time(for syncing only the new and the changed submissions)
+@method_decorator([revalidate, child_submissions_condition], name='get')
+class SubmissionListOfChildView(GuidedChildMixin, generics.ListAPIView):
     serializer_class = SubmissionListSerializer
     permission_classes = (IsAuthenticatedAdult, )
+    pagination_class = SubmissionKeysetPagination
 
-    def get(self, request, *args, **kwargs):
+    def get_queryset(self):
         # get the child object by its id(provided in the url - its pk - primary key)
         # since ChildProfile isn't the queryset of the view, we need to get it manually
-        # also ListAPIView doesn't have a get_object method
-        child = get_object_or_404(ChildProfile, pk=self.kwargs['pk'])
-        # check if the child belongs to the current adult if not return 403 forbidden
-        current_adult = AdultProfile.objects.get(user=self.request.user)
-        if child.guiding_adult != current_adult:
-            return Response(status=status.HTTP_403_FORBIDDEN)
-        # return all the exercises of the child that were not submitted
-        exercises = Exercise.objects.filter(child=child).exclude(submission_date=None)
-        serializer = self.get_serializer(exercises, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # 403 forbidden if the child doesn't belong to the current adult
+        child = self.get_guided_child()
+        # only the submitted exercises and only the columns of the list
+        exercises = (Exercise.objects.filter(child=child).exclude(submission_date=None)
+                     .only(*SubmissionListSerializer.Meta.fields))
+        params = self.request.query_params
+        if 'level' in params:
+            exercises = exercises.filter(level=get_choice_param(params, 'level', ChildProfile.ExerciseLevel.values))
+        if 'category' in params:
+            exercises = exercises.filter(category=get_choice_param(params, 'category', Exercise.ExerciseCategory.values))
+        # the days are compared in the server's time zone - as the days of the statistics
+        if 'from_date' in params:
+            exercises = exercises.filter(submission_date__gte=start_of_day(get_date_param(params, 'from_date')))
+        if 'to_date' in params:
+            exercises = exercises.filter(submission_date__lt=start_of_day(get_date_param(params, 'to_date') + timedelta(days=1)))
+        if 'since' in params:
+            # the submission worker and rescore_exercises score the submissions after they were submitted
+            since = get_datetime_param(params, 'since')
+            exercises = exercises.filter(Q(submission_date__gt=since) | Q(scored_date__gt=since))
+        return exercises
+
+def get_choice_param(params, name, choices):
+    value = params[name]
+    if value not in choices:
+        raise ValidationError({name: f"Must be one of {', '.join(choices)}."})
+    return value
+
+def get_date_param(params, name):
+    try:
+        value = parse_date(params[name])
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: "Must be a date - YYYY-MM-DD."})
+    return value
+
+def get_datetime_param(params, name):
+    try:
+        value = parse_datetime(params[name])
+    except ValueError:
+        value = None
+    if value is None:
+        raise ValidationError({name: "Must be a date and time in ISO 8601 format."})
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
 
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+@method_decorator([revalidate, condition(etag_func=articles_etag)], name='get')
 class ArticlesView(generics.ListAPIView):
     serializer_class = ArticleSerializer
     permission_classes = (IsAuthenticatedAdult, )
     queryset = Article.objects.all()
+
+# in process metrics of this server worker - only for admins
+class MetricsView(generics.GenericAPIView):
+    permission_classes = (IsAdminUser, )
+
+    def get(self, request):
+        return Response({
+            'vlm_providers': [azure_VLM_provider.stats(), groq_VLM_provider.stats()],
+            'analysis_cache': analysis_cache_stats(),
+            # histograms of the time of each stage of the submissions
+            'timing': timing_stats(),
+        }, status=status.HTTP_200_OK)
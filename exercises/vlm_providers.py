@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+
+from .timing import span, in_current_context
+
+logger = logging.getLogger(__name__)
+
+
+# the VLM requests run on these threads so the providers can be raced against each other
+vlm_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='vlm')
+
+# how many of the last latencies of a provider are kept to calculate its p95
+LATENCY_WINDOW = 200
+# the hedge delay is the p95 of the provider only after it has enough samples
+MIN_LATENCY_SAMPLES = 20
+
+
+# a VLM provider(azure/groq) with its deadline, circuit breaker and counters
+# call - a function(VLM_prompt, image_url, timeout) that returns the provider's answer
+class VLMProvider:
+    def __init__(self, name, call):
+        self.name = name
+        self.call = call
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.consecutive_failures = 0
+        # when the circuit breaker was opened - None while it is closed
+        self.opened_at = None
+
+    @property
+    def timeout(self):
+        return settings.VLM_PROVIDER_TIMEOUTS.get(self.name, settings.VLM_DEFAULT_TIMEOUT)
+
+    # the circuit breaker is open after too many failures in a row
+    # after the cool-down the provider gets another chance(if it fails again it will be skipped again)
+    def is_available(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= settings.VLM_CIRCUIT_BREAKER_COOLDOWN:
+                self.opened_at = None
+                return True
+            self.skipped += 1
+            return False
+
+    def record_success(self, latency):
+        with self.lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.latencies.append(latency)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= settings.VLM_CIRCUIT_BREAKER_FAILURES:
+                self.opened_at = time.monotonic()
+
+    def latency_percentile(self, percentile):
+        with self.lock:
+            latencies = sorted(self.latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percentile / 100))]
+
+    # how long to wait for this provider before also asking the next one
+    def hedge_delay(self):
+        if len(self.latencies) < MIN_LATENCY_SAMPLES:
+            return settings.VLM_HEDGE_DELAY
+        return self.latency_percentile(95)
+
+    # runs on a vlm_executor thread
+    # the timeout is passed to the client, so a slow request fails by itself and counts as a failure
+    def timed_call(self, VLM_prompt, image_url):
+        with self.lock:
+            self.requests += 1
+        start = time.monotonic()
+        try:
+            with span(f"vlm_{self.name}"):
+                answer = self.call(VLM_prompt, image_url, self.timeout)
+        except Exception as e:
+            self.record_failure()
+            logger.warning("Failed to recognize the text using the %s model: %s", self.name, e)
+            raise
+        self.record_success(time.monotonic() - start)
+        logger.debug("%s answered successfully", self.name)
+        return answer
+
+    def stats(self):
+        p50 = self.latency_percentile(50)
+        p95 = self.latency_percentile(95)
+        with self.lock:
+            return {
+                'provider': self.name,
+                'requests': self.requests,
+                'successes': self.successes,
+                'failures': self.failures,
+                'skipped': self.skipped,
+                'consecutive_failures': self.consecutive_failures,
+                'circuit_open': self.opened_at is not None,
+                'latency_p50': p50,
+                'latency_p95': p95,
+            }
+
+
+# ask the providers by their order of preference
+# the next provider is asked when the previous one failed, or in parallel(hedged) when it is slower than its usual p95
+# returns the first answer and the name of the provider that gave it - (None, None) if none of them answered in time
+def race_providers(providers, VLM_prompt, image_url):
+    waiting_providers = [provider for provider in providers if provider.is_available()]
+    running = {}
+    hedge_at = None
+
+    def ask_next_provider():
+        provider = waiting_providers.pop(0)
+        future = vlm_executor.submit(in_current_context(provider.timed_call), VLM_prompt, image_url)
+        running[future] = (provider, time.monotonic())
+        return time.monotonic() + provider.hedge_delay()
+
+    if waiting_providers:
+        hedge_at = ask_next_provider()
+    while running:
+        # wake up on the first answer, the closest deadline or when it is time to hedge
+        wake_at = min(start + provider.timeout for provider, start in running.values())
+        if waiting_providers:
+            wake_at = min(wake_at, hedge_at)
+        done, _ = wait(running, timeout=max(0.0, wake_at - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            provider, _ = running.pop(future)
+            if future.exception() is None:
+                # the rest of the requests keep running in the background, their answers are ignored
+                return future.result(), provider.name
+        now = time.monotonic()
+        # stop waiting for providers that passed their deadline
+        for future, (provider, start) in list(running.items()):
+            if now >= start + provider.timeout:
+                running.pop(future)
+        # a failed provider is replaced right away, a slow one after its hedge delay
+        if waiting_providers and (not running or now >= hedge_at):
+            hedge_at = ask_next_provider()
+    return None, None
@@ -0,0 +1,40 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from .models import CategorizedWord
+
+
+# the categorized words are loaded once for all the categories(category - tuple of its words)
+# it is cleared by the signals when a word is saved or deleted(signals.py)
+# other server workers don't get these signals - so the index is also loaded again after WORD_INDEX_TTL seconds
+words_by_category = None
+loaded_at = 0.0
+index_lock = threading.Lock()
+
+
+def get_words_by_category():
+    global words_by_category, loaded_at
+    index = words_by_category
+    if index is None or time.monotonic() - loaded_at > settings.WORD_INDEX_TTL:
+        with index_lock:
+            if words_by_category is index:
+                lists_by_category = {}
+                for category, word in CategorizedWord.objects.values_list('category', 'word'):
+                    lists_by_category.setdefault(category, []).append(word)
+                words_by_category = {category: tuple(words) for category, words in lists_by_category.items()}
+                loaded_at = time.monotonic()
+            index = words_by_category
+    return index
+
+
+def get_random_word(category):
+    return random.choice(get_words_by_category().get(category, ()))
+
+
+def invalidate_word_index(**kwargs):
+    global words_by_category
+    with index_lock:
+        words_by_category = None
@@ -0,0 +1,10 @@
+# gunicorn loads this file by itself when it is started from the project's folder
+
+# load the django app in the master process - the workers are forked from it
+preload_app = True
+
+# runs in the master process before the workers are forked
+# the models are loaded once and shared by the workers(copy-on-write) instead of being loaded by each one of them
+def when_ready(server):
+    from exercises.ai_models import warm_up_models
+    server.log.info("Loaded models: %s", ", ".join(warm_up_models()))
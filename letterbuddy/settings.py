@@ -53,6 +53,44 @@ GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
 
 AZURE_TOKEN = os.environ.get('AZURE_TOKEN')
 
+# the VLM providers are raced against each other(exercises/vlm_providers.py)
+# the deadline(in seconds) of each provider's request
+VLM_DEFAULT_TIMEOUT = float(os.environ.get('VLM_DEFAULT_TIMEOUT', '20'))
+VLM_PROVIDER_TIMEOUTS = {
+    'azure': float(os.environ.get('AZURE_VLM_TIMEOUT', '15')),
+    'groq': float(os.environ.get('GROQ_VLM_TIMEOUT', '15')),
+}
+# how long to wait for a provider before also asking the next one
+# until there are enough samples of its latency - after that its p95 latency is used
+VLM_HEDGE_DELAY = float(os.environ.get('VLM_HEDGE_DELAY', '6'))
+# a provider that failed this many times in a row is skipped for the cool-down(in seconds)
+VLM_CIRCUIT_BREAKER_FAILURES = int(os.environ.get('VLM_CIRCUIT_BREAKER_FAILURES', '3'))
+VLM_CIRCUIT_BREAKER_COOLDOWN = float(os.environ.get('VLM_CIRCUIT_BREAKER_COOLDOWN', '60'))
+
+# the unix socket of the OCR server(python manage.py run_ocr_server)
+# if it is not set - every server worker loads its own PaddleOCR model
+OCR_SERVER_SOCKET = os.environ.get('OCR_SERVER_SOCKET')
+OCR_SERVER_TIMEOUT = float(os.environ.get('OCR_SERVER_TIMEOUT', '30'))
+# how many models the OCR server runs at once - each of them takes the memory of a PaddleOCR model
+OCR_SERVER_THREADS = int(os.environ.get('OCR_SERVER_THREADS', '2'))
+
+# the categorized words are kept in the memory of each server worker(exercises/word_index.py)
+# another worker's changes to the words are seen after this many seconds
+WORD_INDEX_TTL = int(os.environ.get('WORD_INDEX_TTL', '3600'))
+
+# the submitted images are scaled down to this size(in pixels, of the longest side) before the models get them
+IMAGE_MAX_SIDE = int(os.environ.get('IMAGE_MAX_SIDE', '1280'))
+# crop the image to the writing before PaddleOCR gets it
+IMAGE_CROP_TO_INK = os.environ.get('IMAGE_CROP_TO_INK', 'False') == 'True'
+
+# the child moves to the next level when the avg score of the last `window` exercises in the current level is at least `promote`
+# and to the previous level when it is at most `demote`
+LEVEL_PROGRESSION = {
+    'letters': {'window': 10, 'promote': 0.7, 'demote': 0.3},
+    'words': {'window': 10, 'promote': 0.7, 'demote': 0.3},
+    'category': {'window': 10, 'promote': 0.7, 'demote': 0.3},
+}
+
 # Application definition
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -124,6 +162,73 @@ DATABASES = {
 }
 
 
+# the default cache is in the memory of each server worker
+# the analysis cache keeps the models' answers of submitted images(exercises/analysis_cache.py)
+# it can be moved to files(django.core.cache.backends.filebased.FileBasedCache with a folder as the location)
+# or to the database(django.core.cache.backends.db.DatabaseCache with a table name, after python manage.py createcachetable)
+CACHES = {
+    # also keeps the children's statistics(exercises/stats.py) and the throttling counters
+    'default': {
+        'BACKEND': os.environ.get('DEFAULT_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DEFAULT_CACHE_LOCATION', ''),
+    },
+    'analysis': {
+        'BACKEND': os.environ.get('ANALYSIS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('ANALYSIS_CACHE_LOCATION', 'analysis'),
+        # entries are removed after a week(in seconds)
+        'TIMEOUT': int(os.environ.get('ANALYSIS_CACHE_TTL', str(7 * 24 * 60 * 60))),
+        # when it is full - the least recently used entries are removed
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', '500')),
+        },
+    },
+}
+
+
+# how long(in seconds) the statistics of a child are kept in the cache
+# they are also replaced when the child submits an exercise
+STATS_CACHE_TTL = int(os.environ.get('STATS_CACHE_TTL', str(24 * 60 * 60)))
+
+
+# the level of each app's logs - the models' failures are warnings and the submissions' timing(exercises/timing.py) is info
+# exercises.trace - every character and every model's answer of the scoring(exercises/tracing.py), logged at debug level
+# set TRACE_LOG_LEVEL to DEBUG to trace all the submissions(NOTSET - the level of the app's logs)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'exercises': {
+            'handlers': ['console'],
+            'level': os.environ.get('EXERCISES_LOG_LEVEL', 'ERROR' if TESTING else 'INFO'),
+        },
+        'exercises.timing': {
+            'level': os.environ.get('TIMING_LOG_LEVEL', 'NOTSET'),
+        },
+        'exercises.trace': {
+            'level': os.environ.get('TRACE_LOG_LEVEL', 'NOTSET'),
+        },
+        'accounts': {
+            'handlers': ['console'],
+            'level': os.environ.get('ACCOUNTS_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+# the part of the submissions(0 - 1) that log their full trace(at info level) even though the traces are off
+SUBMISSION_TRACE_SAMPLE_RATE = float(os.environ.get('SUBMISSION_TRACE_SAMPLE_RATE', '0'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 # will run when using validate_password 